@@ -5,7 +5,10 @@
 # https://github.com/mitsuhiko/jinja2/blob/master/jinja2/filters.py
 # for the original
 
-from jinja2.utils import soft_unicode
+try:
+    from jinja2.utils import soft_unicode
+except ImportError:
+    from markupsafe import soft_str as soft_unicode
 
 def map_format(value, pattern):
     """
@@ -13,8 +16,15 @@ def map_format(value, pattern):
     .. sourcecode:: jinja
         {{ "%s - %s"|format("Hello?", "Foo!") }}
             -> Hello? - Foo!
+    A list is formatted item by item in one call:
+    .. sourcecode:: jinja
+        {{ ['web-1', 'web-2']|map_format("%s.mydomain.fr") }}
+            -> ['web-1.mydomain.fr', 'web-2.mydomain.fr']
     """
-    return soft_unicode(pattern) % (value)
+    pattern = soft_unicode(pattern)
+    if isinstance(value, list):
+        return [pattern % (anitem,) for anitem in value]
+    return pattern % (value)
 
 class FilterModule(object):
     ''' jinja2 filters '''
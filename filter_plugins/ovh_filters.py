@@ -0,0 +1,89 @@
+# plugins/filter/ovh_filters.py (check path in ansible.cfg)
+
+# Filters for OVH modules results. They all take a single value or a list
+# (or a registered loop result with its 'results') and work on every item
+# in one call, so that templating big loops does not call a filter per item.
+
+import re
+
+# Same split as regex_replace('^((.+)(\\.))([^\\.]+)\\.([^\\.]+)$'): sub domain and 2 level domain
+FQDN_PATTERN = re.compile(r'^(?:(.+)\.)?([^.]+\.[^.]+)$')
+
+
+def _items(value):
+    """Return the items of a list or of a registered loop result, None for a single value"""
+    if isinstance(value, dict) and isinstance(value.get('results'), list):
+        return value['results']
+    if isinstance(value, (list, tuple)):
+        return value
+    return None
+
+def split_fqdn(fqdn, part=None):
+    match = FQDN_PATTERN.match(fqdn)
+    if match is None:
+        subdomain, domain = '', fqdn
+    else:
+        subdomain, domain = match.group(1) or '', match.group(2)
+    if part == 'subdomain':
+        return subdomain
+    if part == 'domain':
+        return domain
+    return [subdomain, domain]
+
+def ovh_split_fqdn(value, part=None):
+    """
+    Split FQDNs in sub domain and domain:
+    .. sourcecode:: jinja
+        {{ 'web-1.mydomain.fr'|ovh_split_fqdn }}
+            -> ['web-1', 'mydomain.fr']
+        {{ groups['all']|ovh_split_fqdn('subdomain') }}
+            -> ['web-1', 'web-2']
+    """
+    items = _items(value)
+    if items is None:
+        return split_fqdn(value, part)
+    return [split_fqdn(anitem, part) for anitem in items]
+
+def instance_ip(value, iptype, version):
+    """Return the first IP of an instance or of an ovh_cloud_instance result"""
+    if isinstance(value, dict) and 'ipAddresses' not in value and isinstance(value.get('instance'), dict):
+        value = value['instance']
+    if not isinstance(value, dict):
+        return None
+    for anaddress in value.get('ipAddresses') or []:
+        if anaddress.get('type') == iptype and anaddress.get('version') == version:
+            return anaddress.get('ip')
+    return None
+
+def ovh_public_ipv4(value):
+    """
+    Get the public IPv4 of instances:
+    .. sourcecode:: jinja
+        {{ instance_status|ovh_public_ipv4 }}
+            -> 1.2.3.4
+        {{ instances_status|ovh_public_ipv4 }}
+            -> ['1.2.3.4', '1.2.3.5']
+    """
+    items = _items(value)
+    if items is None:
+        return instance_ip(value, 'public', 4)
+    return [instance_ip(anitem, 'public', 4) for anitem in items]
+
+def ovh_private_ip(value, version=4):
+    """
+    Get the private IP of instances (IPv4 by default)
+    """
+    items = _items(value)
+    if items is None:
+        return instance_ip(value, 'private', version)
+    return [instance_ip(anitem, 'private', version) for anitem in items]
+
+class FilterModule(object):
+    ''' OVH jinja2 filters '''
+
+    def filters(self):
+        return {
+            'ovh_split_fqdn': ovh_split_fqdn,
+            'ovh_public_ipv4': ovh_public_ipv4,
+            'ovh_private_ip': ovh_private_ip,
+}
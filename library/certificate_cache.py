@@ -0,0 +1,239 @@
+#!/usr/bin/env python
+
+ANSIBLE_METADATA = {
+    'metadata_version': '1.0',
+    'supported_by': 'community',
+    'status': ['preview']
+        }
+
+DOCUMENTATION = '''
+---
+module: certificate_cache
+short_description: Reuse certificates which are still valid instead of issuing them again
+description:
+    - check tells if a certificate with the same names and enough days left already exists, either at path
+      or in a store of certificates indexed by their names (SAN set). A certificate found in the store is copied to path
+    - store saves the certificate at path in the store once it is issued
+    - Certificates and keys are read locally, nothing is asked to Let's encrypt or OVH
+author: Julien Couturier
+notes:
+    - Runs on the ansible controller (use delegate_to 127.0.0.1)
+requirements:
+    - cryptography
+options:
+    path:
+        required: true
+        description: Path of the certificate
+    privatekey_path:
+        required: true
+        description: Path of the private key of the certificate
+    common_name:
+        required: true
+        description: Main name of the certificate
+    subject_alt_name:
+        required: false
+        default: []
+        description:
+            - YAML List or comma separated string of the other names of the certificate ('DNS:www.ansible.com,DNS:m.ansible.com')
+    state:
+        required: false
+        default: check
+        choices: ['check', 'store']
+        description:
+            - check looks for a reusable certificate, store adds the certificate at path to the store
+    min_days:
+        required: false
+        default: 30
+        description:
+            - A certificate is reused only when it is valid for more than min_days days
+    store:
+        required: false
+        default: None
+        description:
+            - Directory of the certificate store. Only the certificate at path is checked when not given
+    passphrase:
+        required: false
+        default: None
+        description:
+            - Passphrase of the private key
+'''
+
+EXAMPLES = '''
+- name: Look for a valid certificate
+  certificate_cache:
+    path: "{{ url }}.crt"
+    privatekey_path: "{{ url }}.key"
+    common_name: "{{ url }}"
+    subject_alt_name: "{{ subject_alt_name|default([]) }}"
+    store: "~/.ansible/certificates"
+  register: cert_cache
+  delegate_to: 127.0.0.1
+
+- name: Save the new certificate
+  certificate_cache:
+    path: "{{ url }}.crt"
+    privatekey_path: "{{ url }}.key"
+    common_name: "{{ url }}"
+    store: "~/.ansible/certificates"
+    state: store
+  when: not cert_cache.reusable
+  delegate_to: 127.0.0.1
+'''
+
+RETURN = '''
+reusable:
+    description: True when a certificate with the same names and enough days left is at path (check)
+    returned: success
+    type: bool
+names:
+    description: The names (SAN set) of the certificate
+    returned: success
+    type: list
+days_left:
+    description: Number of days the certificate is still valid
+    returned: when a certificate is found
+    type: int
+source:
+    description: Path of the certificate that is reused
+    returned: when reusable
+    type: str
+'''
+
+import datetime
+import fcntl
+import json
+import os
+
+from ansible.module_utils.cert_utils import HAS_CRYPTOGRAPHY, get_names, write_file, load_private_key, public_key_bytes
+try:
+    from cryptography import x509
+    from cryptography.hazmat.backends import default_backend
+except ImportError:
+    pass
+
+# For Ansible < 2.1
+# Still works on Ansible 2.2.0
+from ansible.module_utils.basic import *
+
+# For Ansible >= 2.1
+# bug: doesn't work with ansible 2.2.0
+# from ansible.module_utils.basic import AnsibleModule
+
+INDEX_FILE = 'index.json'
+
+def read_certificate(cert_path, key_path, passphrase):
+    """Return the names and the expiration date of a certificate if its key matches, else None"""
+    if not os.path.isfile(cert_path) or not os.path.isfile(key_path):
+        return None
+    with open(cert_path, 'rb') as stream:
+        cert = x509.load_pem_x509_certificate(stream.read(), default_backend())
+    if public_key_bytes(load_private_key(key_path, passphrase)) != public_key_bytes(cert):
+        return None
+    names = set()
+    for anattribute in cert.subject.get_attributes_for_oid(x509.NameOID.COMMON_NAME):
+        names.add(anattribute.value.lower())
+    try:
+        san = cert.extensions.get_extension_for_class(x509.SubjectAlternativeName)
+        names.update(aname.lower() for aname in san.value.get_values_for_type(x509.DNSName))
+    except x509.ExtensionNotFound:
+        pass
+    not_after = getattr(cert, 'not_valid_after_utc', None) or cert.not_valid_after.replace(tzinfo=datetime.timezone.utc)
+    return dict(names=sorted(names), not_after=not_after)
+
+def days_left(certificate):
+    return (certificate['not_after'] - datetime.datetime.now(datetime.timezone.utc)).days
+
+def index_key(names):
+    return ','.join(names)
+
+def read_index(store):
+    path = os.path.join(store, INDEX_FILE)
+    if not os.path.exists(path):
+        return {}
+    with open(path) as stream:
+        return json.load(stream)
+
+def copy_file(source_path, path, mode=0o600):
+    with open(source_path, 'rb') as stream:
+        write_file(path, stream.read(), mode)
+
+def check_certificate(module, names):
+    """Find a reusable certificate at path or in the store"""
+    path = module.params['path']
+    key_path = module.params['privatekey_path']
+    candidates = [(path, key_path)]
+    store = module.params['store']
+    if store:
+        entry = read_index(store).get(index_key(names))
+        if entry:
+            candidates.append((entry['path'], entry['privatekey_path']))
+    result = dict(reusable=False, names=names)
+    for cert_path, cert_key_path in candidates:
+        try:
+            certificate = read_certificate(cert_path, cert_key_path, module.params['passphrase'])
+        except (IOError, OSError, ValueError, TypeError):
+            # Unreadable or corrupted files are issued again
+            continue
+        if certificate is None or certificate['names'] != names:
+            continue
+        result['days_left'] = days_left(certificate)
+        if result['days_left'] <= module.params['min_days']:
+            continue
+        result.update(reusable=True, source=cert_path)
+        if os.path.abspath(cert_path) == os.path.abspath(path):
+            module.exit_json(changed=False, **result)
+        if not module.check_mode:
+            copy_file(cert_key_path, key_path)
+            copy_file(cert_path, path, 0o644)
+        module.exit_json(changed=True, **result)
+    module.exit_json(changed=False, **result)
+
+def store_certificate(module, names):
+    """Add the certificate at path to the store index"""
+    store = module.params['store']
+    if not store:
+        module.fail_json(changed=False, msg="store is needed to save a certificate")
+    path = os.path.abspath(module.params['path'])
+    key_path = os.path.abspath(module.params['privatekey_path'])
+    certificate = read_certificate(path, key_path, module.params['passphrase'])
+    if certificate is None:
+        module.fail_json(changed=False, msg="%s does not exist or does not match %s" % (path, key_path))
+    if certificate['names'] != names:
+        module.fail_json(changed=False, msg="Certificate names %s are not %s" % (', '.join(certificate['names']), ', '.join(names)))
+    entry = dict(path=path, privatekey_path=key_path, not_after=certificate['not_after'].isoformat())
+    if not os.path.isdir(store):
+        os.makedirs(store, 0o700)
+    with open(os.path.join(store, INDEX_FILE + '.lock'), 'w') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        index = read_index(store)
+        if index.get(index_key(names)) == entry:
+            module.exit_json(changed=False, names=names, days_left=days_left(certificate))
+        index[index_key(names)] = entry
+        if not module.check_mode:
+            write_file(os.path.join(store, INDEX_FILE), json.dumps(index, indent=2, sort_keys=True))
+    module.exit_json(changed=True, names=names, days_left=days_left(certificate))
+
+def main():
+    module = AnsibleModule(
+            argument_spec=dict(
+                path=dict(required=True, type='path'),
+                privatekey_path=dict(required=True, type='path'),
+                common_name=dict(required=True),
+                subject_alt_name=dict(required=False, default=[], type='raw'),
+                state=dict(default='check', choices=['check', 'store']),
+                min_days=dict(required=False, default=30, type='int'),
+                store=dict(required=False, default=None, type='path'),
+                passphrase=dict(required=False, default=None, no_log=True),
+                ),
+            supports_check_mode=True
+            )
+    if not HAS_CRYPTOGRAPHY:
+        module.fail_json(msg='cryptography is needed to read certificates')
+    names = get_names(module.params['common_name'], module.params['subject_alt_name'])
+    if module.params['state'] == 'store':
+        store_certificate(module, names)
+    check_certificate(module, names)
+
+
+if __name__ == '__main__':
+        main()
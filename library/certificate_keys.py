@@ -0,0 +1,146 @@
+#!/usr/bin/env python
+
+ANSIBLE_METADATA = {
+    'metadata_version': '1.0',
+    'supported_by': 'community',
+    'status': ['preview']
+        }
+
+DOCUMENTATION = '''
+---
+module: certificate_keys
+short_description: Create the private keys and CSRs of many certificates at once
+description:
+    - Generate the private key and the CSR of each certificate in a pool of processes (one by CPU by default)
+    - Keys and CSRs which already match their certificate (key type and size, subject and names) are kept
+    - Files are written atomically
+author: Julien Couturier
+notes:
+    - Runs on the ansible controller (use delegate_to 127.0.0.1 and run_once)
+    - ECC keys are much faster to generate than RSA ones
+requirements:
+    - cryptography
+options:
+    certificates:
+        required: true
+        description:
+            - List of certificates. Each one has a common_name and optionally privatekey_path (<common_name>.key by default),
+              csr_path (<common_name>.csr by default), subject_alt_name, type, size, curve, passphrase, country_name,
+              state_or_province_name, organization_name, organizational_unit_name and email_address (like openssl_csr)
+    type:
+        required: false
+        default: RSA
+        choices: ['RSA', 'ECC']
+        description:
+            - Default key type
+    size:
+        required: false
+        default: 2048
+        description:
+            - Default size of RSA keys
+    curve:
+        required: false
+        default: secp256r1
+        choices: ['secp256r1', 'secp384r1', 'secp521r1']
+        description:
+            - Default curve of ECC keys
+    workers:
+        required: false
+        default: None
+        description:
+            - Number of processes generating keys (number of CPUs by default)
+'''
+
+EXAMPLES = '''
+- name: Create keys and CSRs of all hosts
+  certificate_keys:
+    type: ECC
+    certificates: "{{ groups['all']|map('extract', hostvars)|map(attribute='cert_spec')|list }}"
+  run_once: true
+  delegate_to: 127.0.0.1
+
+- name: Create the key and the CSR of a certificate
+  certificate_keys:
+    certificates:
+      - { common_name: 'www.mydomain.fr', subject_alt_name: 'DNS:mydomain.fr', organization_name: 'KDG' }
+  delegate_to: 127.0.0.1
+'''
+
+RETURN = '''
+certificates:
+    description: For each certificate, its common_name and if its key and its CSR were changed
+    returned: success
+    type: list
+'''
+
+import os
+
+from ansible.module_utils.cert_utils import HAS_CRYPTOGRAPHY, CURVES, ensure_key_and_csr
+
+# For Ansible < 2.1
+# Still works on Ansible 2.2.0
+from ansible.module_utils.basic import *
+
+# For Ansible >= 2.1
+# bug: doesn't work with ansible 2.2.0
+# from ansible.module_utils.basic import AnsibleModule
+
+def get_specs(module):
+    """Complete each certificate with the default values, each key and CSR path only once"""
+    specs = []
+    paths = {}
+    for acertificate in module.params['certificates']:
+        if not acertificate.get('common_name'):
+            module.fail_json(changed=False, msg="Each certificate needs a common_name")
+        spec = dict(type=module.params['type'], size=module.params['size'], curve=module.params['curve'],
+                    privatekey_path='%s.key' % acertificate['common_name'], csr_path='%s.csr' % acertificate['common_name'])
+        spec.update(acertificate)
+        spec['size'] = int(spec['size'])
+        if spec['type'] not in ['RSA', 'ECC'] or spec['curve'] not in CURVES:
+            module.fail_json(changed=False, msg="Unsupported key type %s (%s) for %s" % (spec['type'], spec['curve'], spec['common_name']))
+        spec['privatekey_path'] = os.path.expanduser(spec['privatekey_path'])
+        spec['csr_path'] = os.path.expanduser(spec['csr_path'])
+        # Hosts sharing a certificate give the same spec: two processes must not write the same files
+        claimed = [paths[apath] for apath in (spec['privatekey_path'], spec['csr_path']) if apath in paths]
+        if claimed:
+            if any(aspec != spec for aspec in claimed):
+                module.fail_json(changed=False, msg="%s and %s write the same key or CSR" % (claimed[0]['common_name'], spec['common_name']))
+            continue
+        paths[spec['privatekey_path']] = paths[spec['csr_path']] = spec
+        specs.append(spec)
+    return specs
+
+def main():
+    module = AnsibleModule(
+            argument_spec=dict(
+                certificates=dict(required=True, type='list'),
+                type=dict(default='RSA', choices=['RSA', 'ECC']),
+                size=dict(required=False, default=2048, type='int'),
+                curve=dict(default='secp256r1', choices=CURVES),
+                workers=dict(required=False, default=None, type='int'),
+                ),
+            supports_check_mode=True
+            )
+    if not HAS_CRYPTOGRAPHY:
+        module.fail_json(msg='cryptography is needed to create keys')
+    specs = get_specs(module)
+    check_mode = [module.check_mode] * len(specs)
+    if len(specs) <= 1:
+        results = list(map(ensure_key_and_csr, specs, check_mode))
+    else:
+        # Key generation is CPU bound: processes, not threads
+        from concurrent.futures import ProcessPoolExecutor
+        pool = ProcessPoolExecutor(max_workers=min(module.params['workers'] or os.cpu_count() or 1, len(specs)))
+        try:
+            results = list(pool.map(ensure_key_and_csr, specs, check_mode))
+        finally:
+            pool.shutdown()
+    changed = any(aresult['key_changed'] or aresult['csr_changed'] for aresult in results)
+    failed = [aresult['msg'] for aresult in results if aresult.get('failed')]
+    if failed:
+        module.fail_json(changed=changed, msg="Failed to create keys: %s" % ', '.join(failed), certificates=results)
+    module.exit_json(changed=changed, certificates=results)
+
+
+if __name__ == '__main__':
+        main()
@@ -0,0 +1,181 @@
+#!/usr/bin/env python
+
+ANSIBLE_METADATA = {
+    'metadata_version': '1.0',
+    'supported_by': 'community',
+    'status': ['preview']
+        }
+
+DOCUMENTATION = '''
+---
+module: dns_propagation
+short_description: Wait until DNS records are served by all the authoritative name servers
+description:
+    - Ask all the authoritative name servers of a zone together, for all the records together, until they all answer the expected values
+    - Name servers are read from OVH API when only the domain is given
+    - Reports the time each record took to be served everywhere
+author: Julien Couturier
+notes:
+    - Runs on the ansible controller (use delegate_to 127.0.0.1)
+    - Queries are sent over UDP, TCP is used when an answer is truncated
+    - OVH API credentials (/etc/ovh.conf or module options) are only needed when name_servers is not given
+requirements:
+    - python >= 3.5
+    - ovh > 0.3.5 (when name_servers is not given)
+options:
+    records:
+        required: true
+        description:
+            - List of records (name, type and value) to wait for. type is A by default,
+              name is a FQDN or a sub domain of domain
+    domain:
+        required: false
+        default: None
+        description:
+            - Zone of the records. Its name servers are asked when name_servers is not given
+    name_servers:
+        required: false
+        default: None
+        description:
+            - Name servers to query (names or addresses)
+    port:
+        required: false
+        default: 53
+        description:
+            - DNS port of the name servers
+    timeout:
+        required: false
+        default: 300
+        description:
+            - Maximum number of seconds to wait for the records
+    query_timeout:
+        required: false
+        default: 3
+        description:
+            - Maximum number of seconds to wait for each answer
+    endpoint:
+        required: false
+        default: None
+        description:
+            - EndPoint for ovh API (if not present /etc/ovh.conf is used)
+    application_key:
+        required: false
+        default: None
+        description:
+            - application_key for ovh API (if not present /etc/ovh.conf is used)
+    application_secret
+        required: false
+        default: None
+        description:
+            - application_secret for ovh API (if not present /etc/ovh.conf is used)
+    consumer_key
+        required: false
+        default: None
+        description:
+            - consumer_key for ovh API (if not present /etc/ovh.conf is used)
+'''
+
+EXAMPLES = '''
+- name: Wait for the new A records
+  dns_propagation:
+    domain: mydomain.fr
+    records:
+      - { name: 'web-1', value: '1.2.3.4' }
+      - { name: 'www.mydomain.fr', type: 'CNAME', value: 'web-1.mydomain.fr' }
+  delegate_to: 127.0.0.1
+
+# Against a local DNS server (e.g. for tests)
+- name: Wait for a TXT record
+  dns_propagation:
+    name_servers: ['127.0.0.1']
+    port: 5353
+    records:
+      - { name: '_acme-challenge.mydomain.fr', type: 'TXT', value: 'token' }
+'''
+
+RETURN = '''
+records:
+    description: For each record, the answer of each name server, converged and the seconds it took (elapsed)
+    returned: always
+    type: list
+name_servers:
+    description: Addresses of the name servers checked
+    returned: always
+    type: list
+'''
+
+import socket
+
+from ansible.module_utils.dns_utils import RECORD_TYPES, resolve_servers, wait_for_propagation
+from ansible.module_utils.profile_utils import run_module
+
+# For Ansible < 2.1
+# Still works on Ansible 2.2.0
+from ansible.module_utils.basic import *
+
+# For Ansible >= 2.1
+# bug: doesn't work with ansible 2.2.0
+# from ansible.module_utils.basic import AnsibleModule
+
+def get_records(module, domain):
+    """Return the (name, type, value) to wait for"""
+    records = []
+    for arecord in module.params['records']:
+        if not arecord.get('name') or arecord.get('value') is None:
+            module.fail_json(changed=False, msg="Each record needs a name and a value")
+        rtype = arecord.get('type', 'A')
+        if rtype not in RECORD_TYPES:
+            module.fail_json(changed=False, msg="Type %s is not supported, use one of %s" % (rtype, ', '.join(sorted(RECORD_TYPES))))
+        name = arecord['name'].rstrip('.')
+        if domain and name != domain and not name.endswith('.' + domain):
+            name = '%s.%s' % (name, domain)
+        records.append((name, rtype, str(arecord['value'])))
+    return records
+
+def main():
+    module = AnsibleModule(
+            argument_spec=dict(
+                records=dict(required=True, type='list'),
+                domain=dict(required=False, default=None),
+                name_servers=dict(required=False, default=None, type='list'),
+                port=dict(required=False, default=53, type='int'),
+                timeout=dict(required=False, default=300, type='int'),
+                query_timeout=dict(required=False, default=3, type='int'),
+                endpoint=dict(required=False, default=None),
+                application_key=dict(required=False, default=None, no_log=True),
+                application_secret=dict(required=False, default=None, no_log=True),
+                consumer_key=dict(required=False, default=None, no_log=True),
+                ),
+            supports_check_mode=True
+            )
+    domain = module.params['domain']
+    names = module.params['name_servers']
+    if not names:
+        if not domain:
+            module.fail_json(changed=False, msg="domain or name_servers is needed")
+        # OVH client (and requests) are only loaded when the name servers have to be asked to OVH
+        from ansible.module_utils.ovh_utils import HAS_OVH, get_ovh_client, get_zone_name_servers
+        if not HAS_OVH:
+            module.fail_json(msg='OVH Api wrapper not installed')
+        from ansible.module_utils.ovh_utils import APIError
+        try:
+            client = get_ovh_client(module)
+        except APIError as apiError:
+            module.fail_json(
+                changed=False, msg="Failed to call OVH API on initialization: {0}".format(apiError))
+        names = get_zone_name_servers(client, module, domain)
+    records = get_records(module, domain)
+    try:
+        servers = resolve_servers(names, module.params['port'])
+    except socket.error as error:
+        module.fail_json(changed=False, msg="Failed to resolve name servers %s: %s" % (', '.join(names), error))
+    results = wait_for_propagation(servers, records, module.params['port'], module.params['timeout'], module.params['query_timeout'])
+    pending = sorted(set(aresult['name'] for aresult in results if not aresult['converged']))
+    if pending:
+        module.fail_json(changed=False, msg="Records of %s are not served by all name servers" % ', '.join(pending),
+                         records=results, name_servers=servers)
+    module.exit_json(changed=False, records=results, name_servers=servers)
+
+
+if __name__ == '__main__':
+        run_module(main)
@@ -76,15 +76,7 @@ EXAMPLES = '''
 
 RETURN = ''' # '''
 
-import ast
-import yaml
-
-try:
-    import json
-except ImportError:
-    import simplejson as json
-
-from ansible.module_utils.ovh_utils import HAS_OVH, get_ovh_client, get_cloud, APIError
+from ansible.module_utils.ovh_utils import HAS_OVH, get_ovh_client, get_cloud, APIError, run_module
 
 # For Ansible < 2.1
 # Still works on Ansible 2.2.0
@@ -149,4 +141,4 @@ def main():
     
 
 if __name__ == '__main__':
-        main()
+        run_module(main)
@@ -0,0 +1,146 @@
+#!/usr/bin/env python
+
+ANSIBLE_METADATA = {
+    'metadata_version': '1.0',
+    'supported_by': 'community',
+    'status': ['preview']
+        }
+
+DOCUMENTATION = '''
+---
+module: ovh_cloud_catalog
+short_description: Get OVH Cloud resources ids
+description:
+    - Fetch flavors, images, SSH keys, private networks and instances of an OVH Public Cloud project in one call
+    - Returns name to id maps as facts so that other modules can be given ids instead of names
+author: Julien Couturier
+notes:
+    - In /etc/ovh.conf (on host that executes module), you should add your
+      OVH API credentials like:
+      [default]
+      ; general configuration: default endpoint
+      endpoint=ovh-eu
+
+      [ovh-eu]
+      ; configuration specific to 'ovh-eu' endpoint
+      application_key=<YOUR APPLICATION KEY>
+      application_secret=<YOUR APPLICATIOM SECRET>
+      consumer_key=<YOUR CONSUMER KEY>
+    - It is also possible to put those conf in ansible variables
+requirements:
+    - ovh > 0.3.5
+options:
+    cloud_name:
+        required: true
+        description: The name of the cloud
+    regions:
+        required: true
+        description:
+            - Regions whose flavors and images are fetched
+    endpoint:
+        required: false
+        default: None
+        description:
+            - EndPoint for ovh API (if not present /etc/ovh.conf is used)
+    application_key:
+        required: false
+        default: None
+        description:
+            - application_key for ovh API (if not present /etc/ovh.conf is used)
+    application_secret
+        required: false
+        default: None
+        description:
+            - application_secret for ovh API (if not present /etc/ovh.conf is used)
+    consumer_key
+        required: false
+        default: None
+        description:
+            - consumer_key for ovh API (if not present /etc/ovh.conf is used)
+'''
+
+EXAMPLES = '''
+# Resolve the catalog once
+- name: Get cloud catalog
+  ovh_cloud_catalog: cloud_name='MyCloud' regions="['SBG3']"
+
+# Then give ids to the other modules
+- name: Create instances
+  ovh_cloud_instance:
+    name: "{{ item }}"
+    cloud_id: "{{ ovh_cloud_catalog.cloud_id }}"
+    flavor_id: "{{ ovh_cloud_catalog.flavors[hostvars[item]['region']][hostvars[item]['flavor']] }}"
+    image_id: "{{ ovh_cloud_catalog.images[hostvars[item]['region']][hostvars[item]['image']] }}"
+    sshkey_id: "{{ ovh_cloud_catalog.sshkeys['MyKey'] }}"
+    region: "{{ hostvars[item]['region'] }}"
+  with_items: "{{ groups['all'] }}"
+'''
+
+RETURN = '''
+ovh_cloud_catalog:
+    description: cloud_id, flavors and images by region (name to id), sshkeys, networks and instances (name to id)
+    returned: success
+    type: dict
+'''
+
+from ansible.module_utils.ovh_utils import HAS_OVH, get_ovh_client, get_cloud_id, run_parallel, APIError, run_module
+
+# For Ansible < 2.1
+# Still works on Ansible 2.2.0
+from ansible.module_utils.basic import *
+
+# For Ansible >= 2.1
+# bug: doesn't work with ansible 2.2.0
+# from ansible.module_utils.basic import AnsibleModule
+
+def name_index(objects):
+    return dict((anobject['name'], anobject['id']) for anobject in objects)
+
+def main():
+    module = AnsibleModule(
+            argument_spec=dict(
+                cloud_name=dict(required=True),
+                regions=dict(required=True, type='list'),
+                endpoint=dict(required=False, default=None),
+                application_key=dict(required=False, default=None, no_log=True),
+                application_secret=dict(required=False, default=None, no_log=True),
+                consumer_key=dict(required=False, default=None, no_log=True),
+                ),
+            supports_check_mode=True
+            )
+    if not HAS_OVH:
+        module.fail_json(msg='OVH Api wrapper not installed')
+    try:
+        client = get_ovh_client(module)
+    except APIError as apiError:
+        module.fail_json(
+            changed=False, msg="Failed to call OVH API on initialization: {0}".format(apiError))
+    cloud_id = get_cloud_id(client, module, module.params['cloud_name'])
+    regions = module.params['regions']
+    # Every listing is independant: they are all fetched together
+    calls = [('sshkeys', None, '/cloud/project/%s/sshkey' % cloud_id, {}),
+             ('networks', None, '/cloud/project/%s/network/private' % cloud_id, {}),
+             ('instances', None, '/cloud/project/%s/instance' % cloud_id, {})]
+    for aregion in regions:
+        calls.append(('flavors', aregion, '/cloud/project/%s/flavor' % cloud_id, {'region': aregion}))
+        calls.append(('images', aregion, '/cloud/project/%s/image' % cloud_id, {'region': aregion}))
+        calls.append(('snapshots', aregion, '/cloud/project/%s/snapshot' % cloud_id, {'region': aregion}))
+    try:
+        results = run_parallel(lambda acall: client.get(acall[2], **acall[3]), calls)
+    except APIError as apiError:
+        module.fail_json(changed=False, msg="Failed to call OVH API on catalog: {0}".format(apiError))
+    catalog = dict(cloud_id=cloud_id, flavors={}, images={}, sshkeys={}, networks={}, instances={})
+    for (kind, region, path, query), objects in zip(calls, results):
+        if kind in ['sshkeys', 'networks', 'instances']:
+            catalog[kind] = name_index(objects)
+        else:
+            # Snapshots can be used as images, public images win on name conflicts
+            kind = 'images' if kind == 'snapshots' else kind
+            region_index = name_index(objects)
+            region_index.update(catalog[kind].get(region, {}))
+            catalog[kind][region] = region_index
+    module.exit_json(changed=False, ansible_facts=dict(ovh_cloud_catalog=catalog))
+
+
+if __name__ == '__main__':
+        run_module(main)
@@ -0,0 +1,188 @@
+#!/usr/bin/env python
+
+ANSIBLE_METADATA = {
+    'metadata_version': '1.0',
+    'supported_by': 'community',
+    'status': ['preview']
+        }
+
+DOCUMENTATION = '''
+---
+module: ovh_cloud_image
+short_description: Manage OVH Cloud instance snapshots (images)
+description:
+    - Snapshot an instance of OVH Public Cloud to get an image that can be used to create new instances
+    - Delete an instance snapshot
+author: Julien Couturier
+notes:
+    - In /etc/ovh.conf (on host that executes module), you should add your
+      OVH API credentials like:
+      [default]
+      ; general configuration: default endpoint
+      endpoint=ovh-eu
+
+      [ovh-eu]
+      ; configuration specific to 'ovh-eu' endpoint
+      application_key=<YOUR APPLICATION KEY>
+      application_secret=<YOUR APPLICATIOM SECRET>
+      consumer_key=<YOUR CONSUMER KEY>
+    - It is also possible to put those conf in ansible variables
+    - The snapshot name can then be used as image of ovh_cloud_instance
+requirements:
+    - ovh > 0.3.5
+options:
+    name:
+        required: true
+        description: The name of the image (snapshot)
+    cloud_name:
+        required: true
+        description: The name of the cloud where the image has to be created
+    state:
+        required: false
+        default: present
+        choices: ['present', 'absent']
+        description:
+            - Determines whether the image has to be created or deleted
+    instance_name:
+        required: false
+        description:
+            - The name of the instance to snapshot (needed to create the image)
+    region:
+        required: false
+        default: None
+        description:
+            - The region of the image
+    wait:
+        required: false
+        default: true
+        description:
+            - Wait until the image is active
+    wait_timeout:
+        required: false
+        default: 1800
+        description:
+            - How many seconds to wait for the image
+    endpoint:
+        required: false
+        default: None
+        description:
+            - EndPoint for ovh API (if not present /etc/ovh.conf is used)
+    application_key:
+        required: false
+        default: None
+        description:
+            - application_key for ovh API (if not present /etc/ovh.conf is used)
+    application_secret
+        required: false
+        default: None
+        description:
+            - application_secret for ovh API (if not present /etc/ovh.conf is used)
+    consumer_key
+        required: false
+        default: None
+        description:
+            - consumer_key for ovh API (if not present /etc/ovh.conf is used)
+'''
+
+EXAMPLES = '''
+# Create a golden image from a configured instance
+- name: Snapshot web-1
+  ovh_cloud_image: name='web-golden' instance_name='web-1.mydomain.fr' state='present' cloud_name='MyCloud'
+
+# Boot a new instance from the golden image
+- name: Create web-2
+  ovh_cloud_instance: name='web-2.mydomain.fr' image='web-golden' flavor='s1-4' sshKey='MyKey' region='SBG3' cloud_name='MyCloud'
+
+# Remove the golden image
+- name: Remove image
+  ovh_cloud_image: name='web-golden' state='absent' cloud_name='MyCloud'
+'''
+
+RETURN = ''' # '''
+
+from time import sleep, time
+
+from ansible.module_utils.ovh_utils import HAS_OVH, get_ovh_client, get_cloud_id, get_snapshot, get_instance, APIError, run_module
+
+# For Ansible < 2.1
+# Still works on Ansible 2.2.0
+from ansible.module_utils.basic import *
+
+# For Ansible >= 2.1
+# bug: doesn't work with ansible 2.2.0
+# from ansible.module_utils.basic import AnsibleModule
+
+def wait_for_image(client, module, cloud_id, region):
+    deadline = time() + module.params['wait_timeout']
+    delay = 5
+    while True:
+        image = get_snapshot(client, module, cloud_id, module.params['name'], region)
+        if image is not None:
+            if image['status'] == 'active':
+                return image
+            if image['status'] in ['killed', 'deleted', 'error']:
+                module.fail_json(changed=True, msg="Image %s creation failed with status %s" % (module.params['name'], image['status']), image=image)
+        if time() > deadline:
+            module.fail_json(changed=True, msg="Timeout while waiting for image %s" % module.params['name'], image=image)
+        sleep(delay)
+        delay = min(delay * 2, 30)
+
+def main():
+    module = AnsibleModule(
+            argument_spec=dict(
+                state=dict(default='present', choices=['present', 'absent']),
+                name=dict(required=True),
+                cloud_name=dict(required=True),
+                instance_name=dict(required=False, default=None),
+                region=dict(required=False, default=None),
+                wait=dict(required=False, default=True, type='bool'),
+                wait_timeout=dict(required=False, default=1800, type='int'),
+                endpoint=dict(required=False, default=None),
+                application_key=dict(required=False, default=None, no_log=True),
+                application_secret=dict(required=False, default=None, no_log=True),
+                consumer_key=dict(required=False, default=None, no_log=True),
+                ),
+            supports_check_mode=True
+            )
+    if not HAS_OVH:
+        module.fail_json(msg='OVH Api wrapper not installed')
+    try:
+        client = get_ovh_client(module)
+    except APIError as apiError:
+        module.fail_json(
+            changed=False, msg="Failed to call OVH API on initialization: {0}".format(apiError))
+    cloud_id = get_cloud_id(client, module, module.params['cloud_name'])
+    existing_image = get_snapshot(client, module, cloud_id, module.params['name'], module.params['region'])
+    if existing_image is None:
+        if module.params['state'] == 'absent':
+            module.exit_json(changed=False)
+        if not module.params['instance_name']:
+            module.fail_json(changed=False, msg="instance_name is needed to create an image")
+        instance = get_instance(client, module, cloud_id, module.params['instance_name'], module.params['region'])
+        if instance is None:
+            module.fail_json(changed=False, msg="Instance %s does not exist" % module.params['instance_name'])
+        if module.check_mode:
+            module.exit_json(changed=False, msg="Image has to be created")
+        try:
+            client.post('/cloud/project/%s/instance/%s/snapshot' % (cloud_id, instance['id']), snapshotName=module.params['name'])
+        except APIError as apiError:
+            module.fail_json(changed=False, msg="Failed to call OVH API on snapshot: {0}".format(apiError))
+        if module.params['wait']:
+            existing_image = wait_for_image(client, module, cloud_id, instance['region'])
+        module.exit_json(changed=True, msg="Image %s created" % module.params['name'], image=existing_image)
+    else:
+        if module.params['state'] == 'absent':
+            if module.check_mode:
+                module.exit_json(changed=False, msg="Image has to be deleted", image=existing_image)
+            try:
+                client.delete('/cloud/project/%s/snapshot/%s' % (cloud_id, existing_image['id']))
+                module.exit_json(changed=True, msg="Image %s deleted" % module.params['name'])
+            except APIError as apiError:
+                module.fail_json(changed=False, msg="Failed to call OVH API on delete: {0}".format(apiError))
+        if module.params['wait'] and existing_image['status'] != 'active':
+            existing_image = wait_for_image(client, module, cloud_id, existing_image['region'])
+        module.exit_json(changed=False, msg="Image %s already exists" % module.params['name'], image=existing_image)
+
+
+if __name__ == '__main__':
+        run_module(main)
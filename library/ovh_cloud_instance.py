@@ -33,8 +33,11 @@ options:
         required: true
         description: The name of instance
     cloud_name:
-        required: true
-        description: The name of the cloud where instance has to be created
+        required: false
+        description: The name of the cloud where instance has to be created (cloud_name or cloud_id is needed)
+    cloud_id:
+        required: false
+        description: The id of the cloud (e.g. from ovh_cloud_catalog), no lookup by name is done
     state:
         required: false
         default: present
@@ -57,6 +60,23 @@ options:
         required: false    
         description:
             - sshKey_Name to enable
+    flavor_id:
+        required: false
+        description:
+            - Id of the flavor, used instead of flavor (e.g. from ovh_cloud_catalog)
+    image_id:
+        required: false
+        description:
+            - Id of the image, used instead of image (e.g. from ovh_cloud_catalog)
+    sshkey_id:
+        required: false
+        description:
+            - Id of the SSH key, used instead of sshKey (e.g. from ovh_cloud_catalog)
+    fields:
+        required: false
+        default: []
+        description:
+            - Fields of the instance returned with state status (all fields when empty)
     endpoint:
         required: false
         default: None
@@ -95,15 +115,7 @@ EXAMPLES = '''
 
 RETURN = ''' # '''
 
-import ast
-import yaml
-
-try:
-    import json
-except ImportError:
-    import simplejson as json
-
-from ansible.module_utils.ovh_utils import HAS_OVH, get_ovh_client, get_cloud_id, get_flavor_id, get_image_id, get_sshkey_id, get_instance, APIError
+from ansible.module_utils.ovh_utils import HAS_OVH, get_ovh_client, resolve_cloud_id, get_flavor_id, get_image_id, get_sshkey_id, get_instance, project_object, APIError, run_module
 
 # For Ansible < 2.1
 # Still works on Ansible 2.2.0
@@ -113,15 +125,46 @@ from ansible.module_utils.basic import *
 # bug: doesn't work with ansible 2.2.0
 # from ansible.module_utils.basic import AnsibleModule
 
+def resolve_flavor_id(client, module, cloud_id):
+    return module.params['flavor_id'] or get_flavor_id(client, module, cloud_id, module.params['region'], module.params['flavor'])
+
+def resolve_image_id(client, module, cloud_id):
+    return module.params['image_id'] or get_image_id(client, module, cloud_id, module.params['region'], module.params['image'])
+
+def get_instance_details(client, module, cloud_id, instance):
+    """Instance details include its flavor and image, which avoids catalog lookups when nothing changed"""
+    if module.params['flavor_id'] and module.params['image_id']:
+        return instance
+    try:
+        return client.get('/cloud/project/%s/instance/%s' % (cloud_id, instance['id']))
+    except APIError as apiError:
+        module.fail_json(changed=False, msg="Failed to call OVH API on get instance: {0}".format(apiError))
+
+def flavor_matches(client, module, cloud_id, instance):
+    if not module.params['flavor_id'] and instance.get('flavor'):
+        return instance['flavor']['name'] == module.params['flavor']
+    return instance['flavorId'] == resolve_flavor_id(client, module, cloud_id)
+
+def image_matches(client, module, cloud_id, instance):
+    # image is empty when the instance image does not exist anymore
+    if not module.params['image_id'] and instance.get('image'):
+        return instance['image']['name'] == module.params['image']
+    return instance['imageId'] == resolve_image_id(client, module, cloud_id)
+
 def main():
     module = AnsibleModule(
             argument_spec=dict(
                 state=dict(default='present', choices=['present', 'absent', 'reboot', 'reinstall', 'status']),
                 name=dict(required=True),
-                cloud_name=dict(required=True),
+                cloud_name=dict(required=False),
+                cloud_id=dict(required=False),
                 flavor=dict(required=False),
+                flavor_id=dict(required=False),
                 image=dict(required=False),
+                image_id=dict(required=False),
                 sshKey=dict(required=False),
+                sshkey_id=dict(required=False),
+                fields=dict(required=False, default=[], type='list'),
                 monthlyBilling=dict(required=False, default='False', choices=['True', 'False']),
                 region=dict(required=False),
                 endpoint=dict(required=False, default=None),
@@ -138,17 +181,15 @@ def main():
     except APIError as apiError:
         module.fail_json(
             changed=False, msg="Failed to call OVH API on initialization: {0}".format(apiError))
-    cloud_id = get_cloud_id(client, module, module.params['cloud_name'])
-    existing_instance = get_instance(client, module, cloud_id, module.params['name'])
+    cloud_id = resolve_cloud_id(client, module)
+    existing_instance = get_instance(client, module, cloud_id, module.params['name'], module.params['region'])
     changed = False
     if module.params['state'] not in ['absent', 'status']:
-        if not (module.params['flavor'] and module.params['image'] and module.params['sshKey'] and module.params['region']):
+        if not ((module.params['flavor'] or module.params['flavor_id']) and (module.params['image'] or module.params['image_id']) and (module.params['sshKey'] or module.params['sshkey_id']) and module.params['region']):
             module.fail_json(changed=False, msg="flavor, image and sshKey are needed to create an instance")                       
-        else:
-            flavor_id= get_flavor_id(client, module, cloud_id, module.params['region'], module.params['flavor'])
-            image_id= get_image_id(client, module, cloud_id, module.params['region'], module.params['image'])
-            sshKey_id = get_sshkey_id(client, module, cloud_id, module.params['sshKey'])      
     if module.params['state'] == 'status':
+        if existing_instance is not None:
+            existing_instance = project_object(existing_instance, module.params['fields'])
         module.exit_json(changed=False, instance=existing_instance)
     if existing_instance is None:
         if module.params['state'] == 'absent':
@@ -157,6 +198,9 @@ def main():
             if module.check_mode:
                 module.exit_json(changed=False, msg="Instance has to be created")            
             else:
+                flavor_id = resolve_flavor_id(client, module, cloud_id)
+                image_id = resolve_image_id(client, module, cloud_id)
+                sshKey_id = module.params['sshkey_id'] or get_sshkey_id(client, module, cloud_id, module.params['sshKey'])      
                 try:           
                     existing_instance = client.post('/cloud/project/%s/instance' % cloud_id,
     # flavorId=None, // Instance flavor id (type: string)
@@ -191,20 +235,24 @@ def main():
                 except APIError as apiError:
                     module.fail_json(changed=False, msg="Failed to call OVH API on delete: {0}".format(apiError))       
         else:
-            if existing_instance['imageId'] != image_id or module.params['state'] == 'reinstall':
+            # Catalogs are only downloaded when the instance differs from what is asked
+            instance_details = get_instance_details(client, module, cloud_id, existing_instance)
+            if not image_matches(client, module, cloud_id, instance_details) or module.params['state'] == 'reinstall':
                 if module.check_mode:
                     module.exit_json(changed=False, msg="Instance has to be reinstalled", instance=existing_instance)                            
                 else:
                     changed = True
+                image_id = resolve_image_id(client, module, cloud_id)
                 try:
                     client.post('/cloud/project/%s/instance/%s/reinstall' % (cloud_id, existing_instance['id']), imageId=image_id)                             
                 except APIError as apiError:
                     module.fail_json(changed=False, msg="Failed to call OVH API on reinstall: {0}".format(apiError))                           
-            if existing_instance['flavorId'] != flavor_id:
+            if not flavor_matches(client, module, cloud_id, instance_details):
                 if module.check_mode:
                     module.exit_json(changed=False, msg="Instance has to be upgraded", instance=existing_instance)                            
                 else:
                     changed = True
+                flavor_id = resolve_flavor_id(client, module, cloud_id)
                 try:
                     client.post('/cloud/project/%s/instance/%s/resize' % (cloud_id, existing_instance['id']), flavorId=flavor_id)                             
                 except APIError as apiError:
@@ -224,4 +272,4 @@ def main():
     
 
 if __name__ == '__main__':
-        main()
+        run_module(main)
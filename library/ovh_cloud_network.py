@@ -33,8 +33,14 @@ options:
         required: true
         description: The network name
     cloud_name:
-        required: true
-        description: The name of the cloud where network has to be created
+        required: false
+        description: The name of the cloud where network has to be created (cloud_name or cloud_id is needed)
+    cloud_id:
+        required: false
+        description: The id of the cloud (e.g. from ovh_cloud_catalog), no lookup by name is done
+    network_id:
+        required: false
+        description: The id of the network (e.g. from ovh_cloud_catalog), the network is got directly instead of being looked up by name
     state:
         required: false
         default: present
@@ -99,15 +105,7 @@ EXAMPLES = '''
 
 RETURN = ''' # '''
 
-import ast
-import yaml
-
-try:
-    import json
-except ImportError:
-    import simplejson as json
-
-from ansible.module_utils.ovh_utils import HAS_OVH, get_ovh_client, get_cloud_id, get_private_network, APIError, get_instance, get_interface
+from ansible.module_utils.ovh_utils import HAS_OVH, get_ovh_client, resolve_cloud_id, get_private_network, get_private_network_by_id, APIError, get_instance, get_interface, run_module
 
 # For Ansible < 2.1
 # Still works on Ansible 2.2.0
@@ -175,7 +173,9 @@ def main():
             argument_spec = dict(
                 state = dict(default='present', choices=['present', 'absent', 'attached', 'detached']),
                 name  = dict(required=True),
-                cloud_name = dict(required=True),
+                cloud_name = dict(required=False),
+                cloud_id = dict(required=False),
+                network_id = dict(required=False),
                 vlanid = dict(required=False, default=0),
                 regions   = dict(required=False, default=[], type='list'),
                 subnets  = dict(required=False, default=[], type='list'),
@@ -195,8 +195,11 @@ def main():
         client = get_ovh_client(module)
     except APIError as apiError:
         module.fail_json(changed=False, msg="Failed to call OVH API: {0}".format(apiError))
-    cloud_id = get_cloud_id(client, module, module.params['cloud_name'])
-    existing_network = get_private_network(client, module, cloud_id, module.params['name'])
+    cloud_id = resolve_cloud_id(client, module)
+    if module.params['network_id']:
+        existing_network = get_private_network_by_id(client, module, cloud_id, module.params['network_id'])
+    else:
+        existing_network = get_private_network(client, module, cloud_id, module.params['name'])
     if existing_network is None:
         if module.params['state'] in ['absent', 'detached']:
             module.exit_json(changed=False)
@@ -276,4 +279,4 @@ def main():
     
 
 if __name__ == '__main__':
-        main()
+        run_module(main)
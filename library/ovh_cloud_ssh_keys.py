@@ -31,10 +31,18 @@ requirements:
 options:
     name:
         required: true
-        description: The name of ssh key
+        description: The name of ssh key (not needed with keys)
+    keys:
+        required: false
+        default: []
+        description:
+            - List of keys (name, publicKey and optionally state) to manage in one task.
+              Keys are compared with their fingerprint, changes are made concurrently
     cloud_name:
         required: true
-        description: The name of the cloud where ssh key has to be created
+        description:
+            - The name of the cloud where ssh key has to be created, or a list of clouds
+              where keys are synchronized (each project is listed once, changes are made concurrently)
     state:
         required: false
         default: present
@@ -49,7 +57,7 @@ options:
         required: false
         default: None
         description:
-            - The region to create SSH Key
+            - The region (or list of regions) to create SSH Key
     endpoint:
         required: false
         default: None
@@ -81,6 +89,22 @@ EXAMPLES = '''
 - name: Add a key
   ovh_cloud_ssh_keys: name='ssh-rsa *****' publicKey='VRACK ID' state='present' region='GRA3' cloud_name='MyCloud'
 
+# Sync the team keys in two regions
+- name: Team keys
+  ovh_cloud_ssh_keys:
+    cloud_name: MyCloud
+    region: ['GRA3', 'SBG3']
+    keys:
+      - { name: 'alice', publicKey: 'ssh-ed25519 *****' }
+      - { name: 'bob', state: 'absent' }
+
+# Same keys in all the projects
+- name: Team keys everywhere
+  ovh_cloud_ssh_keys:
+    cloud_name: ['MyCloud', 'MyOtherCloud']
+    keys:
+      - { name: 'alice', publicKey: 'ssh-ed25519 *****' }
+
 # Add/modifed a key
 - name: Remove a key
   ovh_cloud_ssh_keys: name='ssh-rsa *****' publicKey='VRACK ID' state='absent' cloud_name='MyCloud'
@@ -88,15 +112,7 @@ EXAMPLES = '''
 
 RETURN = ''' # '''
 
-import ast
-import yaml
-
-try:
-    import json
-except ImportError:
-    import simplejson as json
-
-from ansible.module_utils.ovh_utils import HAS_OVH, get_ovh_client, get_cloud_id, get_sshkey, APIError
+from ansible.module_utils.ovh_utils import HAS_OVH, get_ovh_client, get_cloud_index, get_cloud_id, get_sshkey, sshkey_fingerprint, run_parallel, APIError, run_module
 
 # For Ansible < 2.1
 # Still works on Ansible 2.2.0
@@ -106,14 +122,67 @@ from ansible.module_utils.basic import *
 # bug: doesn't work with ansible 2.2.0
 # from ansible.module_utils.basic import AnsibleModule
 
+def sync_keys(client, module):
+    """Bring a set of keys to their state in all regions of all projects with a single listing by project
+    and concurrent changes"""
+    keys = module.params['keys'] or [dict(name=module.params['name'], publicKey=module.params['publicKey'])]
+    regions = module.params['region'] or [None]
+    clouds = get_cloud_index(client, module)
+    missing = [aname for aname in module.params['cloud_name'] if aname not in clouds]
+    if missing:
+        module.fail_json(changed=False, msg="Cloud %s does not exist" % ', '.join(missing))
+    projects = [(aname, clouds[aname]['project_id']) for aname in module.params['cloud_name']]
+    try:
+        listings = run_parallel(lambda aproject: client.get('/cloud/project/%s/sshkey' % aproject[1]), projects)
+    except APIError as apiError:
+        module.fail_json(changed=False, msg="Failed to call OVH API on get_sshkey: {0}".format(apiError))
+    to_delete = []
+    to_create = []
+    for (cloud_name, cloud_id), existing_keys in zip(projects, listings):
+        for akey in keys:
+            if not akey.get('name'):
+                module.fail_json(changed=False, msg="Each key needs a name")
+            named_keys = [dict(anexisting, cloud_name=cloud_name, cloud_id=cloud_id) for anexisting in existing_keys if anexisting['name'] == akey['name']]
+            if akey.get('state', module.params['state']) == 'absent':
+                to_delete.extend(named_keys)
+                continue
+            if not akey.get('publicKey'):
+                module.fail_json(changed=False, msg="publicKey is needed to create key %s" % akey['name'])
+            fingerprint = sshkey_fingerprint(akey['publicKey'])
+            # A key whose public key changed is replaced
+            same_keys = [anexisting for anexisting in named_keys if sshkey_fingerprint(anexisting['publicKey']) == fingerprint]
+            to_delete.extend(anexisting for anexisting in named_keys if anexisting not in same_keys)
+            for aregion in regions:
+                if not any(aregion is None or aregion in (anexisting.get('regions') or [aregion]) for anexisting in same_keys):
+                    to_create.append(dict(cloud_name=cloud_name, cloud_id=cloud_id,
+                                          key=dict(name=akey['name'], publicKey=akey['publicKey'], region=aregion)))
+    result = dict(deleted=['%s (%s)' % (akey['name'], akey['cloud_name']) for akey in to_delete],
+                  created=['%s (%s, %s)' % (akey['key']['name'], akey['cloud_name'], akey['key']['region'] or 'all regions') for akey in to_create])
+    if not (to_delete or to_create):
+        module.exit_json(changed=False, msg="Keys already up to date", **result)
+    if module.check_mode:
+        module.exit_json(changed=False, msg="Keys have to be changed", **result)
+    # Deletions first: a replaced key keeps its name
+    try:
+        run_parallel(lambda akey: client.delete('/cloud/project/%s/sshkey/%s' % (akey['cloud_id'], akey['id'])), to_delete)
+    except APIError as apiError:
+        module.fail_json(changed=False, msg="Failed to call OVH API on key delete: {0}".format(apiError), **result)
+    try:
+        run_parallel(lambda akey: client.post('/cloud/project/%s/sshkey' % akey['cloud_id'],
+                                              **dict((aparam, avalue) for aparam, avalue in akey['key'].items() if avalue is not None)), to_create)
+    except APIError as apiError:
+        module.fail_json(changed=True, msg="Failed to call OVH API on key creation: {0}".format(apiError), **result)
+    module.exit_json(changed=True, msg="%s keys deleted, %s keys created" % (len(to_delete), len(to_create)), **result)
+
 def main():
     module = AnsibleModule(
             argument_spec=dict(
                 state=dict(default='present', choices=['present', 'absent']),
-                name=dict(required=True),
-                cloud_name=dict(required=True),
+                name=dict(required=False),
+                keys=dict(required=False, default=[], type='list'),
+                cloud_name=dict(required=True, type='list'),
                 publicKey=dict(required=False, default=None),
-                region=dict(required=False, default=None),
+                region=dict(required=False, default=None, type='list'),
                 endpoint=dict(required=False, default=None),
                 application_key=dict(required=False, default=None, no_log=True),
                 application_secret=dict(required=False, default=None, no_log=True),
@@ -128,9 +197,15 @@ def main():
     except APIError as apiError:
         module.fail_json(
             changed=False, msg="Failed to call OVH API on initialization: {0}".format(apiError))
+    if module.params['keys'] or len(module.params['region'] or []) > 1 or len(module.params['cloud_name']) > 1:
+        sync_keys(client, module)
+    # A single key in a single region of a single project
+    region = module.params['region'][0] if module.params['region'] else None
+    if not module.params['name']:
+        module.fail_json(changed=False, msg="name or keys is needed")
     if module.params['state'] == 'present' and not module.params['publicKey']:
         module.fail_json(changed=False, msg="publicKey is needed to create a key")               
-    cloud_id = get_cloud_id(client, module, module.params['cloud_name'])
+    cloud_id = get_cloud_id(client, module, module.params['cloud_name'][0])
     existing_key = get_sshkey(client, module, cloud_id, module.params['name'])
     if existing_key is None:
         if module.params['state'] == 'absent':
@@ -143,7 +218,7 @@ def main():
                     client.post('/cloud/project/%s/sshkey' % cloud_id,
                         name=module.params['name'],
                         publicKey=module.params['publicKey'],
-                        region=module.params['region'],
+                        region=region,
                     )
                     module.exit_json(changed=True, msg="Key %s created" % module.params['name'])            
                 except APIError as apiError:
@@ -159,7 +234,7 @@ def main():
                 except APIError as apiError:
                     module.fail_json(changed=False, msg="Failed to call OVH API on key delete: {0}".format(apiError))       
         elif module.params['state'] == 'present':
-            if existing_key['publicKey'] == module.params['publicKey']:
+            if sshkey_fingerprint(existing_key['publicKey']) == sshkey_fingerprint(module.params['publicKey']):
                 module.exit_json(changed=False, msg="Key %s already exists" % module.params['name'])                    
             else:
                 if module.check_mode:
@@ -170,7 +245,7 @@ def main():
                         client.post('/cloud/project/%s/sshkey' % cloud_id,
                             name=module.params['name'],
                             publicKey=module.params['publicKey'],
-                            region=module.params['region'],
+                            region=region,
                         )                        
                         module.exit_json(changed=True, msg="Key %s changed" % module.params['name'])        
                     except APIError as apiError:
@@ -178,4 +253,4 @@ def main():
     
 
 if __name__ == '__main__':
-        main()
+        run_module(main)
@@ -0,0 +1,232 @@
+#!/usr/bin/env python
+
+ANSIBLE_METADATA = {
+    'metadata_version': '1.0',
+    'supported_by': 'community',
+    'status': ['preview']
+        }
+
+DOCUMENTATION = '''
+---
+module: ovh_cloud_teardown
+short_description: Remove many OVH Cloud instances and their DNS records
+description:
+    - Delete the instances of the given hosts and the A records pointing to their public IPs
+    - Instances are read from a single listing, DNS records are removed in one zone change with a single refresh
+      and instances are deleted concurrently
+    - All the instances sharing a host name are deleted, those names are returned in duplicates
+    - Returns the known_hosts entries to purge
+author: Julien Couturier
+notes:
+    - In /etc/ovh.conf (on host that executes module), you should add your
+      OVH API credentials like:
+      [default]
+      ; general configuration: default endpoint
+      endpoint=ovh-eu
+
+      [ovh-eu]
+      ; configuration specific to 'ovh-eu' endpoint
+      application_key=<YOUR APPLICATION KEY>
+      application_secret=<YOUR APPLICATIOM SECRET>
+      consumer_key=<YOUR CONSUMER KEY>
+    - It is also possible to put those conf in ansible variables
+requirements:
+    - ovh > 0.3.5
+options:
+    hosts:
+        required: true
+        description: Names of the instances to remove (FQDN when domain is given)
+    cloud_name:
+        required: false
+        description: The name of the cloud of the instances (cloud_name or cloud_id is needed)
+    cloud_id:
+        required: false
+        description: The id of the cloud (e.g. from ovh_cloud_catalog)
+    domain:
+        required: false
+        default: None
+        description:
+            - DNS zone where A records of the hosts are removed. No DNS change when not given
+    region:
+        required: false
+        default: None
+        description:
+            - Region of the instances
+    wait:
+        required: false
+        default: false
+        description:
+            - Wait until instances are gone
+    wait_timeout:
+        required: false
+        default: 600
+        description:
+            - How many seconds to wait for instances removal
+    workers:
+        required: false
+        default: 10
+        description:
+            - Number of simultaneous OVH API calls
+    endpoint:
+        required: false
+        default: None
+        description:
+            - EndPoint for ovh API (if not present /etc/ovh.conf is used)
+    application_key:
+        required: false
+        default: None
+        description:
+            - application_key for ovh API (if not present /etc/ovh.conf is used)
+    application_secret
+        required: false
+        default: None
+        description:
+            - application_secret for ovh API (if not present /etc/ovh.conf is used)
+    consumer_key
+        required: false
+        default: None
+        description:
+            - consumer_key for ovh API (if not present /etc/ovh.conf is used)
+'''
+
+EXAMPLES = '''
+- name: Clear instances and their DNS
+  ovh_cloud_teardown:
+    hosts: "{{ groups['all'] }}"
+    cloud_name: MyCloud
+    domain: mydomain.fr
+    wait: yes
+  register: teardown
+
+- name: Clear saved public ssh keys
+  shell: "ssh-keygen -R {{ item }}"
+  with_items: "{{ teardown.known_hosts }}"
+'''
+
+RETURN = '''
+instances:
+    description: Names of the deleted instances (a name is repeated for each of its instances)
+    returned: success
+    type: list
+duplicates:
+    description: Host names shared by several instances, all of them were deleted
+    returned: success
+    type: list
+records:
+    description: DNS records deleted
+    returned: success
+    type: list
+known_hosts:
+    description: Host names and IPs whose known_hosts entries have to be purged
+    returned: success
+    type: list
+'''
+
+from ansible.module_utils.ovh_utils import HAS_OVH, get_ovh_client, resolve_cloud_id, get_collection, run_parallel, wait_with_backoff, APIError, run_module
+
+# For Ansible < 2.1
+# Still works on Ansible 2.2.0
+from ansible.module_utils.basic import *
+
+# For Ansible >= 2.1
+# bug: doesn't work with ansible 2.2.0
+# from ansible.module_utils.basic import AnsibleModule
+
+def get_public_ipv4(instance):
+    for anaddress in instance.get('ipAddresses') or []:
+        if anaddress['type'] == 'public' and anaddress['version'] == 4:
+            return anaddress['ip']
+    return None
+
+def get_subdomain(host, domain):
+    if host == domain:
+        return ''
+    if host.endswith('.' + domain):
+        return host[:-len(domain) - 1]
+    return None
+
+def main():
+    module = AnsibleModule(
+            argument_spec=dict(
+                hosts=dict(required=True, type='list'),
+                cloud_name=dict(required=False),
+                cloud_id=dict(required=False),
+                domain=dict(required=False, default=None),
+                region=dict(required=False, default=None),
+                wait=dict(required=False, default=False, type='bool'),
+                wait_timeout=dict(required=False, default=600, type='int'),
+                workers=dict(required=False, default=10, type='int'),
+                endpoint=dict(required=False, default=None),
+                application_key=dict(required=False, default=None, no_log=True),
+                application_secret=dict(required=False, default=None, no_log=True),
+                consumer_key=dict(required=False, default=None, no_log=True),
+                ),
+            supports_check_mode=True
+            )
+    if not HAS_OVH:
+        module.fail_json(msg='OVH Api wrapper not installed')
+    try:
+        client = get_ovh_client(module)
+    except APIError as apiError:
+        module.fail_json(
+            changed=False, msg="Failed to call OVH API on initialization: {0}".format(apiError))
+    cloud_id = resolve_cloud_id(client, module)
+    domain = module.params['domain']
+    workers = module.params['workers']
+    instance_path = '/cloud/project/%s/instance' % cloud_id
+    query = {'region': module.params['region']} if module.params['region'] else {}
+    try:
+        listing = client.get(instance_path, **query)
+    except APIError as apiError:
+        module.fail_json(changed=False, msg="Failed to call OVH API on get_instance: {0}".format(apiError))
+    # Every instance of a name is torn down, names shared by several instances are reported
+    hosts = set(module.params['hosts'])
+    instances = [aninstance for aninstance in listing if aninstance['name'] in hosts]
+    names = [aninstance['name'] for aninstance in instances]
+    duplicates = sorted(set(aname for aname in names if names.count(aname) > 1))
+    known_hosts = list(module.params['hosts'])
+    expected = set()
+    for aninstance in instances:
+        ip = get_public_ipv4(aninstance)
+        if ip:
+            known_hosts.append(ip)
+            subdomain = get_subdomain(aninstance['name'], domain) if domain else None
+            if subdomain is not None:
+                expected.add((subdomain, ip))
+    records = []
+    if domain:
+        # One zone download for all hosts
+        try:
+            records = [arecord for arecord in get_collection(client, '/domain/zone/%s/record' % domain, 'id', workers)
+                       if arecord['fieldType'] == 'A' and (arecord['subDomain'], arecord['target']) in expected]
+        except APIError as apiError:
+            module.fail_json(changed=False, msg="Failed to call OVH API on get records: {0}".format(apiError))
+    result = dict(instances=names, duplicates=duplicates, records=records, known_hosts=known_hosts)
+    if not instances and not records:
+        module.exit_json(changed=False, **result)
+    if module.check_mode:
+        module.exit_json(changed=True, msg="Instances and records have to be deleted", **result)
+    if records:
+        try:
+            run_parallel(lambda arecord: client.delete('/domain/zone/%s/record/%s' % (domain, arecord['id'])), records, workers)
+            client.post('/domain/zone/%s/refresh' % domain)
+        except APIError as apiError:
+            module.fail_json(changed=True, msg="Failed to call OVH API on delete records: {0}".format(apiError), **result)
+    try:
+        run_parallel(lambda aninstance: client.delete('%s/%s' % (instance_path, aninstance['id'])), instances, workers)
+    except APIError as apiError:
+        module.fail_json(changed=True, msg="Failed to call OVH API on delete instances: {0}".format(apiError), **result)
+    if module.params['wait'] and instances:
+        instance_ids = set(aninstance['id'] for aninstance in instances)
+        def instances_gone():
+            try:
+                return not instance_ids.intersection(aninstance['id'] for aninstance in client.get(instance_path))
+            except APIError as apiError:
+                module.fail_json(changed=True, msg="Failed to call OVH API on get instances: {0}".format(apiError), **result)
+        if not wait_with_backoff(instances_gone, module.params['wait_timeout']):
+            module.fail_json(changed=True, msg="Timeout while waiting for instances removal", **result)
+    module.exit_json(changed=True, msg="%s instances and %s records deleted" % (len(instances), len(records)), **result)
+
+
+if __name__ == '__main__':
+        run_module(main)
@@ -33,14 +33,18 @@ options:
         required: true
         description: The name of volume
     cloud_name:
-        required: true
-        description: The name of the cloud where volume has to be created
+        required: false
+        description: The name of the cloud where volume has to be created (cloud_name or cloud_id is needed)
+    cloud_id:
+        required: false
+        description: The id of the cloud (e.g. from ovh_cloud_catalog), no lookup by name is done
     state:
         required: false
         default: present
         choices: ['present', 'absent', 'attached', 'detached', 'snapshot']
         description:
-            - Determines whether the volume has to be created, modified, deleted, attached or detached
+            - Determines whether the volume has to be created, modified, deleted, attached, detached or snapshoted
+            - With snapshot, name is used as prefix of snapshots names
     size:
         required: true
         description:
@@ -54,6 +58,31 @@ options:
         default: 'classic'        
         description:
             - Volume type : "classic" or "high-speed"   
+    volumes:
+        required: false
+        default: []
+        description:
+            - List of volume names to snapshot (state=snapshot)
+    instances:
+        required: false
+        default: []
+        description:
+            - List of instance names whose attached volumes have to be snapshoted (state=snapshot)
+    description:
+        required: false
+        default: ''
+        description:
+            - Description of the snapshots (state=snapshot)
+    wait:
+        required: false
+        default: true
+        description:
+            - Wait until every snapshot is done (state=snapshot)
+    wait_timeout:
+        required: false
+        default: 600
+        description:
+            - How many seconds to wait for snapshots
     endpoint:
         required: false
         default: None
@@ -88,19 +117,17 @@ EXAMPLES = '''
 # Add/modifed a key
 - name: Remove a key
   ovh_cloud_ssh_keys: name='ssh-rsa *****' publicKey='VRACK ID' state='absent' cloud_name='MyCloud'
+
+# Snapshot every volume attached to the elasticsearch instances at once
+- name: Backup ES volumes
+  ovh_cloud_volume: name='backup-20180101' state='snapshot' cloud_name='MyCloud' instances="{{ groups['supervision-es'] }}"
 '''
 
 RETURN = ''' # '''
 
-import ast
-import yaml
-
-try:
-    import json
-except ImportError:
-    import simplejson as json
+from time import sleep, time
 
-from ansible.module_utils.ovh_utils import HAS_OVH, get_ovh_client, get_cloud_id, get_volume, APIError, get_instance_id
+from ansible.module_utils.ovh_utils import HAS_OVH, get_ovh_client, resolve_cloud_id, get_volume, APIError, get_instance_id, run_parallel, run_module
 
 # For Ansible < 2.1
 # Still works on Ansible 2.2.0
@@ -110,16 +137,83 @@ from ansible.module_utils.basic import *
 # bug: doesn't work with ansible 2.2.0
 # from ansible.module_utils.basic import AnsibleModule
 
+def snapshot_volumes(client, module, cloud_id):
+    if not (module.params['volumes'] or module.params['instances']):
+        module.fail_json(changed=False, msg="volumes or instances are needed to snapshot volumes")
+    try:
+        # OVH API lists the volumes of all regions when no region is given
+        region_filter = dict(region=module.params['region']) if module.params['region'] else {}
+        all_volumes = client.get('/cloud/project/%s/volume' % cloud_id, **region_filter)
+        instance_ids = set()
+        if module.params['instances']:
+            all_instances = dict((aninstance['name'], aninstance['id']) for aninstance in client.get('/cloud/project/%s/instance' % cloud_id))
+            unknown_instances = [aname for aname in module.params['instances'] if aname not in all_instances]
+            if unknown_instances:
+                module.fail_json(changed=False, msg="Instances specified do not exist : %s" % ', '.join(unknown_instances))
+            instance_ids = set(all_instances[aname] for aname in module.params['instances'])
+    except APIError as apiError:
+        module.fail_json(changed=False, msg="Failed to call OVH API on snapshot listing: {0}".format(apiError))
+    volumes = [avolume for avolume in all_volumes if avolume['name'] in module.params['volumes'] or instance_ids.intersection(avolume['attachedTo'])]
+    unknown_volumes = set(module.params['volumes']).difference(avolume['name'] for avolume in volumes)
+    if unknown_volumes:
+        module.fail_json(changed=False, msg="Volumes specified do not exist : %s" % ', '.join(sorted(unknown_volumes)))
+    if module.check_mode:
+        module.exit_json(changed=False, msg="Volumes have to be snapshoted", volumes=[avolume['name'] for avolume in volumes])
+    # All snapshots are requested together so that they are as consistent as possible across the set
+    # A failed request does not hide the snapshots the other requests created
+    def create_snapshot(avolume):
+        try:
+            return avolume, client.post('/cloud/project/%s/volume/%s/snapshot' % (cloud_id, avolume['id']),
+                name='%s-%s' % (module.params['name'], avolume['name']),
+                description=module.params['description'],
+            ), None
+        except APIError as apiError:
+            return avolume, None, "{0}".format(apiError)
+    created = run_parallel(create_snapshot, volumes)
+    snapshots = [asnapshot for avolume, asnapshot, error in created if error is None]
+    errors = dict((avolume['name'], error) for avolume, asnapshot, error in created if error is not None)
+    if errors and not snapshots:
+        module.fail_json(changed=False, msg="Failed to call OVH API on snapshot: %s" % ', '.join('%s: %s' % (aname, errors[aname]) for aname in sorted(errors)),
+                         snapshots=snapshots, errors=errors)
+    if module.params['wait']:
+        def get_snapshot(asnapshot):
+            return client.get('/cloud/project/%s/volume/snapshot/%s' % (cloud_id, asnapshot['id']))
+        deadline = time() + module.params['wait_timeout']
+        pending = [asnapshot for asnapshot in snapshots if asnapshot.get('status') == 'creating']
+        while pending:
+            if time() > deadline:
+                module.fail_json(changed=True, msg="Timeout while waiting for snapshots", snapshots=snapshots, errors=errors)
+            sleep(5)
+            try:
+                refreshed = dict((asnapshot['id'], asnapshot) for asnapshot in run_parallel(get_snapshot, pending))
+            except APIError as apiError:
+                module.fail_json(changed=True, msg="Failed to call OVH API on snapshot status: {0}".format(apiError), snapshots=snapshots, errors=errors)
+            snapshots = [refreshed.get(asnapshot['id'], asnapshot) for asnapshot in snapshots]
+            pending = [asnapshot for asnapshot in snapshots if asnapshot['status'] == 'creating']
+        failed = [asnapshot['name'] for asnapshot in snapshots if asnapshot['status'] != 'available']
+        if failed:
+            module.fail_json(changed=True, msg="Snapshots failed : %s" % ', '.join(failed), snapshots=snapshots, errors=errors)
+    if errors:
+        module.fail_json(changed=True, msg="Failed to call OVH API on snapshot: %s" % ', '.join('%s: %s' % (aname, errors[aname]) for aname in sorted(errors)),
+                         snapshots=snapshots, errors=errors)
+    module.exit_json(changed=True, msg="%s volumes snapshoted" % len(snapshots), snapshots=snapshots)
+
 def main():
     module = AnsibleModule(
             argument_spec=dict(
-                state=dict(default='present', choices=['present', 'absent', 'attached', 'detached']),
+                state=dict(default='present', choices=['present', 'absent', 'attached', 'detached', 'snapshot']),
                 name=dict(required=True),
-                cloud_name=dict(required=True),
+                cloud_name=dict(required=False),
+                cloud_id=dict(required=False),
                 size=dict(required=False),
                 region=dict(required=False),
                 type=dict(required=False, default='classic'),
                 instance_name=dict(required=False, default='None'),
+                volumes=dict(required=False, default=[], type='list'),
+                instances=dict(required=False, default=[], type='list'),
+                description=dict(required=False, default=''),
+                wait=dict(required=False, default=True, type='bool'),
+                wait_timeout=dict(required=False, default=600, type='int'),
                 endpoint=dict(required=False, default='None'),
                 application_key=dict(required=False, default='None', no_log=True),
                 application_secret=dict(required=False, default='None', no_log=True),
@@ -134,8 +228,10 @@ def main():
     except APIError as apiError:
         module.fail_json(
             changed=False, msg="Failed to call OVH API on initialization: {0}".format(apiError))
-    cloud_id = get_cloud_id(client, module, module.params['cloud_name'])
-    existing_volume = get_volume(client, module, cloud_id, module.params['name'])
+    cloud_id = resolve_cloud_id(client, module)
+    if module.params['state'] == 'snapshot':
+        snapshot_volumes(client, module, cloud_id)
+    existing_volume = get_volume(client, module, cloud_id, module.params['name'], module.params['region'])
     changed = False
     if existing_volume is None:
         if module.params['state'] == 'absent':
@@ -187,7 +283,7 @@ def main():
     if module.params['state'] in ['attached', 'detached']:
         if not module.params['instance_name']:
             module.fail_json(changed=False, msg="instance_name is needed to attach or detach a volume")                       
-        instance_id = get_instance_id(client, module, cloud_id, module.params['instance_name'])
+        instance_id = get_instance_id(client, module, cloud_id, module.params['instance_name'], module.params['region'])
         if instance_id in existing_volume['attachedTo']:
             if module.params['state'] == 'detached':
                 if module.check_mode:
@@ -211,4 +307,4 @@ def main():
     
 
 if __name__ == '__main__':
-        main()
+        run_module(main)
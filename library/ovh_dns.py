@@ -62,6 +62,18 @@ options:
         choices: ['present', 'absent']
         description:
             - Determines wether the record is to be created/modified or deleted
+    refresh:
+        default: now
+        choices: ['now', 'deferred']
+        description:
+            - When the zone is changed, refresh it right away (now) or only mark it in the refresh journal (deferred),
+              then ovh_dns_flush refreshes each marked zone once. Use deferred when many records are changed in a loop
+    refresh_journal:
+        required: false
+        default: None
+        description:
+            - Path of the refresh journal on the host running the module (OVH_REFRESH_JOURNAL environment variable,
+              else ~/.ansible/ovh_dns_refresh.json)
     endpoint:
         required: true
         description:
@@ -106,6 +118,27 @@ EXAMPLES = '''
     application_secret: yoursecret
     consumer_key: yourconsumerkey
 
+# Create many records, then refresh the zone once
+- ovh_dns:
+    domain: mydomain.com
+    name: "{{ item.name }}"
+    value: "{{ item.ip }}"
+    refresh: deferred
+    endpoint: ovh-eu
+    application_key: yourkey
+    application_secret: yoursecret
+    consumer_key: yourconsumerkey
+  with_items: "{{ servers }}"
+  delegate_to: 127.0.0.1
+
+- ovh_dns_flush:
+    endpoint: ovh-eu
+    application_key: yourkey
+    application_secret: yoursecret
+    consumer_key: yourconsumerkey
+  delegate_to: 127.0.0.1
+  run_once: true
+
 # Delete an existing record, must specify all parameters
 - ovh_dns:
     state: absent
@@ -126,9 +159,6 @@ ANSIBLE_METADATA = {'status': ['preview'],
                     'supported_by': 'community',
                     'version': '1.0'}
 
-import os
-import sys
-
 try:
     import ovh
     from ovh.exceptions import APIError
@@ -136,6 +166,8 @@ try:
 except ImportError:
     HAS_OVH=False
 
+from ansible.module_utils.ovh_utils import get_collection, get_refresh_journal, mark_dirty_zones, run_module
+
 def get_ovh_client(module):
     endpoint = module.params.get('endpoint')
     application_key = module.params.get('application_key')
@@ -154,11 +186,8 @@ def get_domain_records(client, domain):
     """Obtain all records for a specific domain"""
     records = {}
 
-    # List all ids and then get info for each one
-    record_ids = client.get('/domain/zone/{0}/record'.format(domain))
-
-    for record_id in record_ids:
-        info = client.get('/domain/zone/{0}/record/{1}'.format(domain, record_id))
+    # Get all records in a few pages when possible, else list all ids and get info for each one
+    for info in get_collection(client, '/domain/zone/{0}/record'.format(domain), 'id'):
         add_record(records, info)
 
     return records
@@ -234,6 +263,14 @@ def ensure_record_present(module, records, client):
     module.exit_json(changed=True)
 
 def refresh_domain(module, client, domain):
+    if module.params.get('refresh') == 'deferred':
+        # ovh_dns_flush refreshes the zone once for all the changes
+        journal = get_refresh_journal(module.params.get('refresh_journal'))
+        try:
+            mark_dirty_zones(journal, {domain: 1})
+        except (IOError, OSError) as error:
+            module.fail_json(msg='Unable to mark domain "{0}" in refresh journal {1}: "{2}"'.format(domain, journal, error))
+        return
     try:
         client.post('/domain/zone/{0}/refresh'.format(domain))
     except APIError as error:
@@ -276,6 +313,8 @@ def main():
             type = dict(default='A', choices=['A', 'AAAA', 'CNAME', 'DKIM', 'LOC', 'MX', 'NAPTR', 'NS', 'PTR', 'SPF', 'SRV', 'SSHFP', 'TXT']),
             ttl = dict(default='0'),
             state = dict(default='present', choices=['present', 'absent']),
+            refresh = dict(default='now', choices=['now', 'deferred']),
+            refresh_journal = dict(required=False, default=None),
             endpoint = dict(required=True),
             application_key = dict(required=True, no_log=True),
             application_secret = dict(required=True, no_log=True),
@@ -329,4 +368,4 @@ def main():
 from ansible.module_utils.basic import *
 
 if __name__ == '__main__':
-    main()
+    run_module(main)
@@ -0,0 +1,238 @@
+#!/usr/bin/env python
+
+ANSIBLE_METADATA = {
+    'metadata_version': '1.0',
+    'supported_by': 'community',
+    'status': ['preview']
+        }
+
+DOCUMENTATION = '''
+---
+module: ovh_dns_challenge
+short_description: Publish or clear all the ACME DNS-01 challenge records of a certificate at once
+description:
+    - Create the TXT records of all the names of a certificate with a single zone listing and a single zone refresh
+    - Wait until every TXT value is served by all the authoritative name servers of the zone
+    - Remove all the challenge records in one batch once the certificate is issued
+author: Julien Couturier
+notes:
+    - In /etc/ovh.conf (on host that executes module), you should add your
+      OVH API credentials like:
+      [default]
+      ; general configuration: default endpoint
+      endpoint=ovh-eu
+
+      [ovh-eu]
+      ; configuration specific to 'ovh-eu' endpoint
+      application_key=<YOUR APPLICATION KEY>
+      application_secret=<YOUR APPLICATIOM SECRET>
+      consumer_key=<YOUR CONSUMER KEY>
+    - It is also possible to put those conf in ansible variables
+    - Runs on the ansible controller (use delegate_to 127.0.0.1), all name servers are queried together over UDP (TCP when the answer is truncated)
+requirements:
+    - ovh > 0.3.5
+options:
+    domain:
+        required: true
+        description: The DNS zone of the certificate names
+    challenge_data:
+        required: true
+        description:
+            - The challenge_data returned by the letsencrypt module (name -> {'dns-01': {resource, resource_value}})
+    state:
+        required: false
+        default: present
+        choices: ['present', 'absent']
+        description:
+            - present publishes the records and waits for them, absent removes them
+    ttl:
+        required: false
+        default: 60
+        description:
+            - TTL of the TXT records
+    wait:
+        required: false
+        default: true
+        description:
+            - Wait until all the authoritative name servers serve the records
+    wait_timeout:
+        required: false
+        default: 300
+        description:
+            - How many seconds to wait for the records
+    name_servers:
+        required: false
+        default: None
+        description:
+            - Name servers to query (names or addresses). Default is the name servers of the zone given by OVH API
+    port:
+        required: false
+        default: 53
+        description:
+            - DNS port of the name servers
+    endpoint:
+        required: false
+        default: None
+        description:
+            - EndPoint for ovh API (if not present /etc/ovh.conf is used)
+    application_key:
+        required: false
+        default: None
+        description:
+            - application_key for ovh API (if not present /etc/ovh.conf is used)
+    application_secret
+        required: false
+        default: None
+        description:
+            - application_secret for ovh API (if not present /etc/ovh.conf is used)
+    consumer_key
+        required: false
+        default: None
+        description:
+            - consumer_key for ovh API (if not present /etc/ovh.conf is used)
+'''
+
+EXAMPLES = '''
+- name: Publish the challenge
+  ovh_dns_challenge:
+    domain: mydomain.fr
+    challenge_data: "{{ cert_challenge['challenge_data'] }}"
+  delegate_to: 127.0.0.1
+
+- name: Clear the challenge
+  ovh_dns_challenge:
+    domain: mydomain.fr
+    challenge_data: "{{ cert_challenge['challenge_data'] }}"
+    state: absent
+  delegate_to: 127.0.0.1
+'''
+
+RETURN = '''
+records:
+    description: The challenge records (subDomain, target)
+    returned: success
+    type: list
+name_servers:
+    description: Addresses of the name servers checked
+    returned: when state is present and wait is true
+    type: list
+propagation:
+    description: For each record, the answers of the name servers and the seconds it took them to agree (elapsed)
+    returned: when state is present and wait is true
+    type: list
+'''
+
+import socket
+import time
+
+from ansible.module_utils.ovh_utils import HAS_OVH, get_ovh_client, get_collection, get_zone_name_servers, run_parallel, APIError, run_module
+
+# For Ansible < 2.1
+# Still works on Ansible 2.2.0
+from ansible.module_utils.basic import *
+
+# For Ansible >= 2.1
+# bug: doesn't work with ansible 2.2.0
+# from ansible.module_utils.basic import AnsibleModule
+
+def get_challenge_records(module, domain, challenge_data):
+    """Return the (subDomain, target) of each challenge of challenge_data"""
+    records = []
+    for aname, challenges in sorted(challenge_data.items()):
+        challenge = challenges.get('dns-01')
+        if not challenge:
+            module.fail_json(changed=False, msg="No dns-01 challenge for %s" % aname)
+        # A wildcard certificate is validated on the name of its parent
+        fqdn = '%s.%s' % (challenge['resource'], aname[2:] if aname.startswith('*.') else aname)
+        if fqdn != domain and not fqdn.endswith('.' + domain):
+            module.fail_json(changed=False, msg="%s is not in zone %s" % (fqdn, domain))
+        records.append((fqdn[:-len(domain) - 1], challenge['resource_value']))
+    return records
+
+def get_existing_records(client, module, domain, records):
+    """Return the zone TXT records matching records"""
+    try:
+        zone_records = get_collection(client, '/domain/zone/%s/record' % domain, 'id')
+    except APIError as apiError:
+        module.fail_json(changed=False, msg="Failed to call OVH API on get records: {0}".format(apiError))
+    wanted = set(records)
+    return [arecord for arecord in zone_records
+            if arecord['fieldType'] == 'TXT' and (arecord['subDomain'], arecord['target'].strip('"')) in wanted]
+
+def wait_for_records(client, module, domain, records):
+    """Wait until each name server answers all the challenge values"""
+    # asyncio is only loaded when records are published
+    from ansible.module_utils.dns_utils import resolve_servers, wait_for_propagation
+    names = module.params['name_servers'] or get_zone_name_servers(client, module, domain)
+    try:
+        servers = resolve_servers(names, module.params['port'])
+    except socket.error as error:
+        module.fail_json(changed=True, msg="Failed to resolve name servers %s: %s" % (', '.join(names), error))
+    results = wait_for_propagation(servers, [('%s.%s' % (subdomain, domain), 'TXT', value) for subdomain, value in records],
+                                   module.params['port'], module.params['wait_timeout'])
+    pending = [aresult for aresult in results if not aresult['converged']]
+    if pending:
+        module.fail_json(changed=True, msg="Timeout while waiting for challenge records", pending=pending)
+    return servers, results
+
+def main():
+    module = AnsibleModule(
+            argument_spec=dict(
+                domain=dict(required=True),
+                challenge_data=dict(required=True, type='dict'),
+                state=dict(default='present', choices=['present', 'absent']),
+                ttl=dict(required=False, default=60, type='int'),
+                wait=dict(required=False, default=True, type='bool'),
+                wait_timeout=dict(required=False, default=300, type='int'),
+                name_servers=dict(required=False, default=None, type='list'),
+                port=dict(required=False, default=53, type='int'),
+                endpoint=dict(required=False, default=None),
+                application_key=dict(required=False, default=None, no_log=True),
+                application_secret=dict(required=False, default=None, no_log=True),
+                consumer_key=dict(required=False, default=None, no_log=True),
+                ),
+            supports_check_mode=True
+            )
+    if not HAS_OVH:
+        module.fail_json(msg='OVH Api wrapper not installed')
+    try:
+        client = get_ovh_client(module)
+    except APIError as apiError:
+        module.fail_json(
+            changed=False, msg="Failed to call OVH API on initialization: {0}".format(apiError))
+    domain = module.params['domain']
+    records = get_challenge_records(module, domain, module.params['challenge_data'])
+    existing = get_existing_records(client, module, domain, records)
+    result = dict(records=[dict(subDomain=subdomain, target=target) for subdomain, target in records])
+    if module.params['state'] == 'absent':
+        if not existing:
+            module.exit_json(changed=False, **result)
+        if module.check_mode:
+            module.exit_json(changed=True, msg="Challenge records have to be deleted", **result)
+        try:
+            run_parallel(lambda arecord: client.delete('/domain/zone/%s/record/%s' % (domain, arecord['id'])), existing)
+            client.post('/domain/zone/%s/refresh' % domain)
+        except APIError as apiError:
+            module.fail_json(changed=True, msg="Failed to call OVH API on delete records: {0}".format(apiError), **result)
+        module.exit_json(changed=True, msg="%s challenge records deleted" % len(existing), **result)
+
+    present = set((arecord['subDomain'], arecord['target'].strip('"')) for arecord in existing)
+    missing = [arecord for arecord in records if arecord not in present]
+    if module.check_mode:
+        module.exit_json(changed=bool(missing), msg="%s challenge records have to be created" % len(missing), **result)
+    start = time.time()
+    if missing:
+        try:
+            run_parallel(lambda arecord: client.post('/domain/zone/%s/record' % domain, fieldType='TXT',
+                                                     subDomain=arecord[0], target=arecord[1], ttl=module.params['ttl']), missing)
+            client.post('/domain/zone/%s/refresh' % domain)
+        except APIError as apiError:
+            module.fail_json(changed=True, msg="Failed to call OVH API on create records: {0}".format(apiError), **result)
+    if module.params['wait']:
+        result['name_servers'], result['propagation'] = wait_for_records(client, module, domain, records)
+    module.exit_json(changed=bool(missing), msg="%s challenge records created" % len(missing),
+                     elapsed=round(time.time() - start, 1), **result)
+
+
+if __name__ == '__main__':
+        run_module(main)
@@ -0,0 +1,162 @@
+#!/usr/bin/env python
+
+ANSIBLE_METADATA = {
+    'metadata_version': '1.0',
+    'supported_by': 'community',
+    'status': ['preview']
+        }
+
+DOCUMENTATION = '''
+---
+module: ovh_dns_flush
+short_description: Refresh once each OVH DNS zone marked by a deferred refresh
+description:
+    - ovh_dns (refresh=deferred) and ovh_infra (service=dns, name=refresh, refresh=deferred) only mark the zones
+      they change in a refresh journal, so that OVH does not regenerate a zone for each record of a loop
+    - This module refreshes each marked zone exactly once, all zones together, and removes them from the journal
+    - Zones whose refresh failed stay in the journal for the next flush
+author: Julien Couturier
+notes:
+    - In /etc/ovh.conf (on host that executes module), you should add your
+      OVH API credentials like:
+      [default]
+      ; general configuration: default endpoint
+      endpoint=ovh-eu
+
+      [ovh-eu]
+      ; configuration specific to 'ovh-eu' endpoint
+      application_key=<YOUR APPLICATION KEY>
+      application_secret=<YOUR APPLICATIOM SECRET>
+      consumer_key=<YOUR CONSUMER KEY>
+    - It is also possible to put those conf in ansible variables
+    - Runs where the journal was written, usually the ansible controller (use delegate_to 127.0.0.1 and run_once),
+      and can be used as a handler notified by the deferred tasks
+requirements:
+    - ovh > 0.3.5
+options:
+    domains:
+        required: false
+        default: None
+        description:
+            - Only refresh these zones (all the marked zones by default)
+    refresh_journal:
+        required: false
+        default: None
+        description:
+            - Path of the refresh journal (OVH_REFRESH_JOURNAL environment variable, else ~/.ansible/ovh_dns_refresh.json)
+    workers:
+        required: false
+        default: 10
+        description:
+            - Number of zones refreshed simultaneously
+    endpoint:
+        required: false
+        default: None
+        description:
+            - EndPoint for ovh API (if not present /etc/ovh.conf is used)
+    application_key:
+        required: false
+        default: None
+        description:
+            - application_key for ovh API (if not present /etc/ovh.conf is used)
+    application_secret
+        required: false
+        default: None
+        description:
+            - application_secret for ovh API (if not present /etc/ovh.conf is used)
+    consumer_key
+        required: false
+        default: None
+        description:
+            - consumer_key for ovh API (if not present /etc/ovh.conf is used)
+'''
+
+EXAMPLES = '''
+- name: Add the records of all servers
+  ovh_dns:
+    domain: mydomain.fr
+    name: "{{ inventory_hostname_short }}"
+    value: "{{ ansible_host }}"
+    refresh: deferred
+    endpoint: ovh-eu
+    application_key: yourkey
+    application_secret: yoursecret
+    consumer_key: yourconsumerkey
+  delegate_to: 127.0.0.1
+  notify: refresh zones
+
+# In handlers
+- name: refresh zones
+  ovh_dns_flush:
+  delegate_to: 127.0.0.1
+  run_once: true
+'''
+
+RETURN = '''
+refreshed:
+    description: The zones refreshed, with the number of refreshes they replace
+    returned: always
+    type: dict
+'''
+
+from ansible.module_utils.ovh_utils import HAS_OVH, get_ovh_client, get_refresh_journal, read_dirty_zones, mark_dirty_zones, \
+    pop_dirty_zones, run_parallel, APIError, run_module
+
+# For Ansible < 2.1
+# Still works on Ansible 2.2.0
+from ansible.module_utils.basic import *
+
+# For Ansible >= 2.1
+# bug: doesn't work with ansible 2.2.0
+# from ansible.module_utils.basic import AnsibleModule
+
+def main():
+    module = AnsibleModule(
+            argument_spec=dict(
+                domains=dict(required=False, default=None, type='list'),
+                refresh_journal=dict(required=False, default=None),
+                workers=dict(required=False, default=10, type='int'),
+                endpoint=dict(required=False, default=None),
+                application_key=dict(required=False, default=None, no_log=True),
+                application_secret=dict(required=False, default=None, no_log=True),
+                consumer_key=dict(required=False, default=None, no_log=True),
+                ),
+            supports_check_mode=True
+            )
+    if not HAS_OVH:
+        module.fail_json(msg='OVH Api wrapper not installed')
+    journal = get_refresh_journal(module.params['refresh_journal'])
+    domains = module.params['domains']
+    try:
+        dirty = dict((azone, acount) for azone, acount in read_dirty_zones(journal).items() if domains is None or azone in domains)
+    except (IOError, OSError) as error:
+        module.fail_json(changed=False, msg="Failed to read refresh journal %s: %s" % (journal, error))
+    if not dirty:
+        module.exit_json(changed=False, msg="No zone to refresh", refreshed={})
+    if module.check_mode:
+        module.exit_json(changed=True, msg="%s zones have to be refreshed" % len(dirty), refreshed=dirty)
+    try:
+        client = get_ovh_client(module)
+    except APIError as apiError:
+        module.fail_json(
+            changed=False, msg="Failed to call OVH API on initialization: {0}".format(apiError))
+    # Zones leave the journal before their refresh: a zone marked meanwhile is refreshed by the next flush
+    dirty = pop_dirty_zones(journal, domains)
+
+    def refresh(zone):
+        try:
+            client.post('/domain/zone/%s/refresh' % zone)
+            return zone, None
+        except APIError as apiError:
+            return zone, "{0}: {1}".format(zone, apiError)
+    failed = dict((zone, error) for zone, error in run_parallel(refresh, sorted(dirty), module.params['workers']) if error)
+    refreshed = dict((azone, acount) for azone, acount in dirty.items() if azone not in failed)
+    if failed:
+        mark_dirty_zones(journal, dict((azone, dirty[azone]) for azone in failed))
+        module.fail_json(changed=bool(refreshed), msg="Failed to call OVH API on refresh: %s" % ', '.join(failed[azone] for azone in sorted(failed)),
+                         refreshed=refreshed)
+    module.exit_json(changed=True, msg="%s zones refreshed" % len(refreshed), refreshed=refreshed)
+
+
+if __name__ == '__main__':
+        run_module(main)
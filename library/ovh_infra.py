@@ -13,6 +13,7 @@ short_description: Manage OVH API for DNS, monitoring and Dedicated servers
 description:
 	- Add/Delete/Modify entries in OVH DNS
 	- Add reverse on OVH dedicated servers
+	- Set or remove the reverses of a whole IP block or of many IPs in one task
 	- Install new dedicated servers from a personal template only
 	- Create a personal OVH template from a file
 	- Monitor installation status on dedicated servers
@@ -40,7 +41,47 @@ requirements:
 options:
 	name:
 		required: true
-		description: The name of the service (dedicated, dns)
+		description: The name of the service (dedicated, dns). Not needed when targets is given
+	targets:
+		required: false
+		default: []
+		description:
+			- List of dedicated servers for boot, monitoring, reverse and install services
+			  Each target is a server name or a dict overriding module options (name, ip, domain, hostname, template, boot, state)
+			  Servers state is fetched concurrently and only servers needing a change are modified
+			  A per-server result map is returned in results
+	workers:
+		required: false
+		default: 10
+		description:
+			- Number of simultaneous OVH API calls in targets mode and list service
+	project_id:
+		required: false
+		default: None
+		description:
+			- The cloud project id used by list service with name instance
+	fields:
+		required: false
+		default: []
+		description:
+			- Fields of each object returned by list service for cloud and instance (all fields when empty)
+	filters:
+		required: false
+		default: {}
+		description:
+			- Filters applied on objects by list service for cloud and instance before they are returned
+			  A filter value can be a glob pattern (name: 'web-*') or a list of accepted values (status: ['ACTIVE', 'BUILD'])
+	output_file:
+		required: false
+		default: None
+		description:
+			- With list service, objects are written as JSON lines in this file while they are fetched
+			  and only the count and the file path are returned. Use it with local_action to write on the controller
+	timeout:
+		required: false
+		default: 3600
+		description:
+			- How many seconds install_wait waits for installations
 	state:
 		required: false
 		default: present
@@ -50,19 +91,21 @@ options:
 			  or deleted
 	service:
 		required: true
-		choices: ['boot', 'dns', 'vrack', 'reverse', 'monitoring', 'install', 'status', 'list', 'template', 'terminate']
+		choices: ['boot', 'dns', 'vrack', 'reverse', 'monitoring', 'install', 'status', 'install_wait', 'list', 'template', 'terminate', 'instance']
 		description:
 			- Determines the service you want to use in the module
 			  boot, change the bootid and can reboot the dedicated server
 			  dns, manage A entries in your domain
 			  vrack, add or remove a dedicated from a vrack
-			  reverse, add/modify a reverse on a dedicated server
+			  reverse, add/modify a reverse on a dedicated server, or on many IPs with reverses or block
 			  monitoring, add/removing a dedicated server from OVH monitoring
 			  install, install from a template
 			  status, used after install to know install status
-			  list, get a list of personal dedicated servers, personal templates
+			  install_wait, wait until installation is over on name or on all targets
+			  list, get a list of personal dedicated servers, personal templates, cloud projects, instances, domain records (records) or IPs (ip)
 			  template, create/delete an ovh template from a yaml file
 			  terminate, give back a dedicated server to OVH
+			  instance, create a public cloud instance named hostname in the cloud project name
 	domain:
 		required: false
 		default: None
@@ -99,7 +142,63 @@ options:
 		required: false
 		default: None
 		description:
-			- The hostname you want to replace in /etc/hostname when applying a template
+			- The hostname you want to replace in /etc/hostname when applying a template, or the name of the instance
+	region:
+		required: false
+		default: None
+		description:
+			- Region of the instance created by instance service
+	flavor:
+		required: false
+		default: None
+		description:
+			- Flavor name of the instance created by instance service
+	image:
+		required: false
+		default: None
+		description:
+			- Image (or snapshot) name of the instance created by instance service
+	sshkey:
+		required: false
+		default: None
+		description:
+			- Name of the SSH key of the cloud project given to the instance created by instance service
+	reverses:
+		required: false
+		default: None
+		description:
+			- With reverse service, the reverses of many IPs, as a dict (ip -> FQDN) or a list of dicts (ip, reverse)
+			  The reverses of each IP block are listed once and only the missing or different ones are set, concurrently
+			  With state absent, a list of IPs whose reverses are removed
+	block:
+		required: false
+		default: None
+		description:
+			- With reverse service, the IP block (e.g. 1.2.3.0/27) of the reverses. Without reverses, reverse_format
+			  names all its IPs (and state absent removes all its reverses). When not given, blocks are found in /ip
+	reverse_format:
+		required: false
+		default: None
+		description:
+			- With reverse service and block, the reverse of each IP of the block (and not in reverses), where {ip},
+			  {dashed} (ip with - instead of . or :) and {index} (position in the block) are replaced
+	check_forward:
+		required: false
+		default: false
+		description:
+			- With reverses or block, only set a reverse when its FQDN already resolves to its IP
+	refresh:
+		required: false
+		default: now
+		choices: ['now', 'deferred']
+		description:
+			- With dns service and name refresh, refresh the domain right away (now) or only mark it
+			  in the refresh journal (deferred). ovh_dns_flush then refreshes each marked domain once
+	refresh_journal:
+		required: false
+		default: None
+		description:
+			- Path of the refresh journal (OVH_REFRESH_JOURNAL environment variable, else ~/.ansible/ovh_dns_refresh.json)
 
 '''
 
@@ -115,10 +214,30 @@ EXAMPLES = '''
 - name: Refresh domain
   ovh: service='dns' name='refresh' domain='{{ domain }}'
 
+# Refresh the domain once at the end of the play (with ovh_dns_flush)
+- name: Refresh domain later
+  ovh: service='dns' name='refresh' domain='{{ domain }}' refresh='deferred'
+
 # Change a server reverse
 - name: Change Reverse on server
   ovh: service=reverse name='internal.bar' ip='1.2.3.4' domain='foo.com'
 
+# Name all the failover IPs of a block
+- name: Change reverses of a block
+  ovh:
+    service: reverse
+    block: 1.2.3.0/27
+    reverse_format: 'failover-{dashed}.foo.com'
+    check_forward: yes
+
+# Set reverses of a few IPs
+- name: Change reverses of IPs
+  ovh:
+    service: reverse
+    reverses:
+      1.2.3.4: 'internal.bar.foo.com'
+      1.2.3.5: 'internal.baz.foo.com'
+
 # Install a server from a template
 - name: Install the dedicated server
   ovh: service='install' name='foo.ovh.eu' hostname='internal.bar.foo.com' template='SOME TEMPLATE'
@@ -133,6 +252,27 @@ EXAMPLES = '''
   retries: 150
   delay: 10
 
+# Reboot a whole fleet on rescue
+- name: Boot servers on rescue
+  ovh: service='boot' boot='rescue' targets="{{ groups['dedicated'] }}"
+
+# Set reverses of many servers
+- name: Change reverses
+  ovh:
+    service: reverse
+    domain: foo.com
+    targets:
+      - { name: 'internal.bar', ip: '1.2.3.4' }
+      - { name: 'internal.baz', ip: '1.2.3.5' }
+
+# Wait for the installation of many servers in one task
+- name: Wait until installations are finished
+  local_action:
+    module: ovh
+    service: install_wait
+    targets: "{{ groups['dedicated'] }}"
+  register: result
+
 # Enable / disable OVH monitoring
 - name: Remove ovh monitoring when necessary
   ovh: service='monitoring' name='foo.ovh.eu' state='present / absent'
@@ -142,6 +282,26 @@ EXAMPLES = '''
   ovh: service='list' name='dedicated'
   register: servers
 
+# List active instances of a region with only their name and IPs
+- name: Get list of instances
+  ovh: service='list' name='instance' project_id='{{ project_id }}'
+  args:
+    fields: ['name', 'ipAddresses']
+    filters:
+      region: SBG3
+      status: ACTIVE
+  register: instances
+
+# Dump all records of a zone on the controller
+- name: Export zone records
+  local_action:
+    module: ovh
+    service: list
+    name: records
+    domain: foo.com
+    output_file: /tmp/foo.com.jsonl
+  register: export
+
 # List personal templates
 - name: Get list of personal templates
   ovh: service='list' name='templates'
@@ -168,13 +328,12 @@ EXAMPLES = '''
 
 RETURN = ''' # '''
 
-import ast
-import yaml
-
+import os
+import time
 try:
-	import json
+	from urllib.parse import quote
 except ImportError:
-	import simplejson as json
+	from urllib import quote
 
 try:
 	import ovh
@@ -184,6 +343,8 @@ try:
 except ImportError:
 	HAS_OVH = False
 
+from ansible.module_utils.ovh_utils import get_ovh_client, iter_collection, get_objects, get_collection, match_filters, project_object, server_side_filters, run_parallel, get_cloud_id, get_flavor_id, get_image_id, get_sshkey_id, get_refresh_journal, mark_dirty_zones, run_module
+
 # For Ansible < 2.1
 # Still works on Ansible 2.2.0
 from ansible.module_utils.basic import *
@@ -294,9 +455,153 @@ def changeReverse(ovhclient, module):
 		if not module.params['ip']:
 			module.fail_json(changed=False, msg="Please give an IP to add your target")
 
+# Most addresses reverse_format may name at once
+MAX_REVERSE_BLOCK = 4096
+
+def getReverseTargets(module):
+	"""Return the reverses asked (ip -> FQDN ending with a dot, None to remove it) from reverses or reverse_format"""
+	import ipaddress
+	reverses = module.params['reverses'] or {}
+	if isinstance(reverses, dict):
+		reverses = [dict(ip=anip, reverse=afqdn) for anip, afqdn in reverses.items()]
+	targets = {}
+	for areverse in reverses:
+		if not isinstance(areverse, dict):
+			areverse = dict(ip=areverse)
+		try:
+			anip = str(ipaddress.ip_address(u'%s' % areverse.get('ip')))
+		except ValueError:
+			module.fail_json(changed=False, msg="%s is not an IP address" % areverse.get('ip'))
+		fqdn = areverse.get('reverse')
+		if not fqdn and module.params['state'] == 'present':
+			module.fail_json(changed=False, msg="Please give the reverse of %s" % anip)
+		targets[anip] = fqdn.rstrip('.') + '.' if fqdn else None
+	if module.params['reverse_format']:
+		network = ipaddress.ip_network(u'%s' % module.params['block'], strict=False)
+		if network.num_addresses > MAX_REVERSE_BLOCK:
+			module.fail_json(changed=False, msg="reverse_format is limited to blocks of %s addresses" % MAX_REVERSE_BLOCK)
+		for index, anaddress in enumerate(network):
+			anip = str(anaddress)
+			if anip not in targets:
+				fqdn = module.params['reverse_format'].format(ip=anip, dashed=anip.replace('.', '-').replace(':', '-'), index=index)
+				targets[anip] = fqdn.rstrip('.') + '.'
+	return targets
+
+def getReverseBlocks(ovhclient, module, ips):
+	"""Return the IP block holding each ip, from the block option or from a single listing of /ip"""
+	import ipaddress
+	if module.params['block']:
+		blocks = [module.params['block']]
+	else:
+		try:
+			blocks = ovhclient.get('/ip')
+		except APIError as apiError:
+			module.fail_json(changed=False, msg="Failed to call OVH API: {0}".format(apiError))
+	networks = sorted([(ipaddress.ip_network(u'%s' % ablock, strict=False), ablock) for ablock in blocks], key=lambda anetwork: -anetwork[0].prefixlen)
+	result = {}
+	for anip in ips:
+		address = ipaddress.ip_address(u'%s' % anip)
+		# The smallest block holding the address
+		result[anip] = next((ablock for network, ablock in networks if network.version == address.version and address in network), None)
+		if result[anip] is None:
+			module.fail_json(changed=False, msg="%s is not in %s" % (anip, module.params['block'] or "your IP blocks"))
+	return result
+
+def checkForward(params):
+	"""Return an error when the FQDN of a reverse does not resolve to its IP"""
+	import ipaddress
+	import socket
+	anip, fqdn = params
+	try:
+		addresses = set(str(ipaddress.ip_address(u'%s' % aninfo[4][0].split('%')[0])) for aninfo in socket.getaddrinfo(fqdn.rstrip('.'), None))
+	except socket.error as error:
+		return "%s does not resolve: %s" % (fqdn, error)
+	if anip not in addresses:
+		return "%s resolves to %s, not %s" % (fqdn, ', '.join(sorted(addresses)), anip)
+	return None
+
+def changeReverses(ovhclient, module):
+	"""Set or remove the reverses of many IPs: the reverses of each block are listed once and only
+	the differences are applied, concurrently"""
+	# Only loaded by this service (ipaddress is not in python 2 without its backport)
+	try:
+		import ipaddress
+	except ImportError:
+		module.fail_json(changed=False, msg='ipaddress is needed to change the reverses of many IPs')
+	if module.params['reverse_format'] and not module.params['block']:
+		module.fail_json(changed=False, msg="reverse_format needs a block")
+	if module.params['block']:
+		try:
+			ipaddress.ip_network(u'%s' % module.params['block'], strict=False)
+		except ValueError:
+			module.fail_json(changed=False, msg="%s is not an IP block" % module.params['block'])
+	targets = getReverseTargets(module)
+	blocks = getReverseBlocks(ovhclient, module, targets)
+	if module.params['block']:
+		block_ips = [module.params['block']]
+	else:
+		block_ips = sorted(set(blocks.values()))
+	existing = {}
+	try:
+		for ablock in block_ips:
+			for areverse in get_collection(ovhclient, '/ip/%s/reverse' % quote(ablock, safe=''), 'ipReverse', module.params['workers']):
+				existing[str(ipaddress.ip_address(u'%s' % areverse['ipReverse']))] = (ablock, areverse['reverse'])
+	except APIError as apiError:
+		module.fail_json(changed=False, msg="Failed to call OVH API: {0}".format(apiError))
+	if module.params['state'] == 'absent':
+		if not targets and module.params['block']:
+			# All the reverses of the block
+			targets = dict((anip, None) for anip in existing)
+		changes = [(anip, None) for anip in sorted(targets) if anip in existing]
+	else:
+		changes = [(anip, targets[anip]) for anip in sorted(targets) if existing.get(anip, (None, None))[1] != targets[anip]]
+	done = "already removed" if module.params['state'] == 'absent' else "already set"
+	results = dict((anip, dict(changed=False, msg="Reverse of %s %s" % (anip, done))) for anip in targets)
+	if module.params['check_forward'] and changes:
+		errors = run_parallel(checkForward, changes, module.params['workers'])
+		for (anip, fqdn), error in zip(changes, errors):
+			if error:
+				results[anip] = dict(changed=False, failed=True, msg=error)
+		changes = [achange for achange, error in zip(changes, errors) if not error]
+	for anip, fqdn in changes:
+		if fqdn:
+			results[anip] = dict(changed=True, msg="Reverse %s to %s" % (anip, fqdn))
+		else:
+			results[anip] = dict(changed=True, msg="Reverse of %s removed" % anip)
+	if not module.check_mode:
+		def apply(change):
+			anip, fqdn = change
+			try:
+				if fqdn:
+					ovhclient.post('/ip/%s/reverse' % quote(blocks.get(anip) or existing[anip][0], safe=''),
+							ipReverse=anip,
+							reverse=fqdn)
+				else:
+					ovhclient.delete('/ip/%s/reverse/%s' % (quote(existing[anip][0], safe=''), anip))
+				return None
+			except APIError as apiError:
+				return "Failed to call OVH API: {0}".format(apiError)
+		for (anip, fqdn), error in zip(changes, run_parallel(apply, changes, module.params['workers'])):
+			if error:
+				results[anip] = dict(changed=False, failed=True, msg=error)
+	changed = any(aresult['changed'] for aresult in results.values())
+	failed = sorted(anip for anip, aresult in results.items() if aresult.get('failed'))
+	if failed:
+		module.fail_json(changed=changed, msg="reverse failed on %s" % ', '.join(failed), results=results)
+	module.exit_json(changed=changed, msg="reverse changed on %s IPs" % len(changes), results=results)
+
 def changeDNS(ovhclient, module):
 	msg = ''
 	if module.params['name'] == 'refresh':
+		if module.params['refresh'] == 'deferred':
+			if module.check_mode:
+				module.exit_json(changed=True, msg="Domain %s marked to be refreshed ! - (dry run mode)" % module.params['domain'])
+			journal = get_refresh_journal(module.params['refresh_journal'])
+			try:
+				mark_dirty_zones(journal, {module.params['domain']: 1})
+			except (IOError, OSError) as error:
+				module.fail_json(changed=False, msg="Failed to write refresh journal %s: %s" % (journal, error))
+			module.exit_json(changed=True, msg="Domain %s marked to be refreshed !" % module.params['domain'])
 		if module.check_mode:
 			module.exit_json(changed=True, msg="Domain %s succesfully refreshed ! - (dry run mode)" % module.params['domain'])
 		try:
@@ -386,6 +691,9 @@ def changeVRACK(ovhclient, module):
 def generateTemplate(ovhclient, module):
 	if module.check_mode:
 		module.exit_json(changed=True, msg="%s succesfully %s on ovh API - (dry run mode)" % (module.params['name'], module.params['state']))
+	# Only templates need these: they are not loaded by the other services
+	import ast
+	import yaml
 	src = module.params['name']
 	with open(src, 'r') as stream:
 		content = yaml.load(stream)
@@ -461,34 +769,58 @@ def changeBootDedicated(ovhclient, module):
 				module.fail_json(changed=False, msg="Failed to call OVH API: {0}".format(apiError))
 		module.exit_json(changed=False, msg="%s already configured for boot on %s" % (module.params['name'], module.params['boot']))
 
-def listDedicated(ovhclient, module):
-	customlist = []
+def selectObjects(module, objects):
+	"""Filter and project objects as they come"""
+	for anobject in objects:
+		if match_filters(anobject, module.params['filters']):
+			yield project_object(anobject, module.params['fields'])
+
+def writeObjects(module, objects):
+	"""Stream objects to output_file as JSON lines and exit with the count only"""
+	import json
+	output_file = os.path.expanduser(module.params['output_file'])
+	count = 0
 	try:
-		result = ovhclient.get('/dedicated/server')
+		try:
+			with open(output_file + '.tmp', 'w') as stream:
+				for anobject in objects:
+					stream.write(json.dumps(anobject) + '\n')
+					count += 1
+			os.rename(output_file + '.tmp', output_file)
+		finally:
+			# Nothing is left behind when the listing or the writing failed
+			if os.path.exists(output_file + '.tmp'):
+				os.remove(output_file + '.tmp')
 	except APIError as apiError:
 		module.fail_json(changed=False, msg="Failed to call OVH API: {0}".format(apiError))
+	except (IOError, OSError) as error:
+		module.fail_json(changed=False, msg="Failed to write %s: %s" % (output_file, error))
+	module.exit_json(changed=False, count=count, path=output_file)
+
+def listDedicated(ovhclient, module):
+	objects = iter_collection(ovhclient, '/dedicated/server', 'name', module.params['workers'])
+	if module.params['output_file']:
+		writeObjects(module, selectObjects(module, objects))
+	customlist = []
 	try:
-		for i in result:
-			test = ovhclient.get('/dedicated/server/%s' % i)
-			customlist.append('%s=%s' % (test['reverse'], i))
+		for test in objects:
+			customlist.append('%s=%s' % (test['reverse'], test['name']))
 	except APIError as apiError:
 		module.fail_json(changed=False, msg="Failed to call OVH API: {0}".format(apiError))
-	module.exit_json(changedFalse=False, objects=customlist)
+	module.exit_json(changed=False, objects=customlist)
 
 def listCloud(ovhclient, module):
+	objects = iter_collection(ovhclient, '/cloud/project', 'project_id', module.params['workers'])
+	if module.params['output_file']:
+		writeObjects(module, selectObjects(module, objects))
 	customdict = {}
 	try:
-		result = ovhclient.get('/cloud/project')
-	except APIError as apiError:
-		module.fail_json(changed=False, msg="Failed to call OVH API: {0}".format(apiError))
-	try:
-		for i in result:
-			project_desc = ovhclient.get('/cloud/project/%s' % i)
-			name = project_desc['description']
-			customdict[name] = project_desc
+		for project_desc in objects:
+			if match_filters(project_desc, module.params['filters']):
+				customdict[project_desc['description']] = project_object(project_desc, module.params['fields'])
 	except APIError as apiError:
 		module.fail_json(changed=False, msg="Failed to call OVH API: {0}".format(apiError))
-	module.exit_json(changedFalse=False, objects=customdict)	
+	module.exit_json(changed=False, objects=customdict)	
 
 def listInstance(ovhclient, module):
 	customdict = {}
@@ -496,16 +828,39 @@ def listInstance(ovhclient, module):
 	if not project_id:
 		module.fail_json(changed=False, msg="Please give the cloud project id you want to list instance")
 	try:
-		result = ovhclient.get('/cloud/project/%s/instance' % project_id)
+		# The listing already returns complete instances, no need to get them one by one
+		result = ovhclient.get('/cloud/project/%s/instance' % project_id, **server_side_filters(module.params['filters'], ['region']))
 	except APIError as apiError:
 		module.fail_json(changed=False, msg="Failed to call OVH API: {0}".format(apiError))
+	if module.params['output_file']:
+		writeObjects(module, selectObjects(module, result))
 	try:
-		for i in result:
-			test = ovhclient.get('/cloud/project/%s/instance/%s' % (project_id, i['id']))
-			customdict[i] = test
+		for test in get_objects(ovhclient, '/cloud/project/' + project_id + '/instance/%s', result, module.params['workers']):
+			if match_filters(test, module.params['filters']):
+				customdict[test['id']] = project_object(test, module.params['fields'])
+	except APIError as apiError:
+		module.fail_json(changed=False, msg="Failed to call OVH API: {0}".format(apiError))
+	module.exit_json(changed=False, objects=customdict)
+
+def listRecords(ovhclient, module):
+	if module.params['domain'] in [None, 'None']:
+		module.fail_json(changed=False, msg="Please give the domain you want to list records")
+	objects = selectObjects(module, iter_collection(ovhclient, '/domain/zone/%s/record' % module.params['domain'], 'id', module.params['workers']))
+	if module.params['output_file']:
+		writeObjects(module, objects)
+	try:
+		module.exit_json(changed=False, objects=list(objects))
+	except APIError as apiError:
+		module.fail_json(changed=False, msg="Failed to call OVH API: {0}".format(apiError))
+
+def listIP(ovhclient, module):
+	objects = selectObjects(module, iter_collection(ovhclient, '/ip', 'ip', module.params['workers']))
+	if module.params['output_file']:
+		writeObjects(module, objects)
+	try:
+		module.exit_json(changed=False, objects=list(objects))
 	except APIError as apiError:
 		module.fail_json(changed=False, msg="Failed to call OVH API: {0}".format(apiError))
-	module.exit_json(changedFalse=False, objects=customdict)
 
 def listTemplates(ovhclient, module):
 	customlist = []
@@ -519,19 +874,8 @@ def listTemplates(ovhclient, module):
 				customlist.append(i)
 	except APIError as apiError:
 			module.fail_json(changed=False, msg="Failed to call OVH API: {0}".format(apiError))
-	module.exit_json(changedFalse=False, objects=customlist)
+	module.exit_json(changed=False, objects=customlist)
 	
-def get_ovh_client(module):
-	if module.params['endpoint'] and module.params['application_key'] and module.params['application_secret'] and module.params['consumer_key']:
-		return ovh.Client(
-			endpoint=module.params['endpoint'],
-			application_key= module.params['application_key'],
-			application_secret=module.params['application_secret'],
-			consumer_key=module.params['consumer_key']
-		)		
-	else:
-		return ovh.Client()	
-
 def create_cloud(ovhclient, module):
 	if module.params['name']:
 		try:	
@@ -554,48 +898,234 @@ def create_cloud(ovhclient, module):
 
 def createInstance(ovhclient, module):
 	if module.params['name'] and module.params['hostname'] and module.params['image'] and module.params['region'] and module.params['flavor']:
-		try:
-			cloud_id = get_cloud_id(ovhclient, module, module.params['name'])
-			result = ovhclient.get('/cloud/project/%s/image' % cloud_id) 
-			if module.params['image'] not in result:
-				module.fail_json(changed=False, msg="%s doesn't exist in personal templates" % module.params['template'])
-		except APIError as apiError:
-			module.fail_json(changed=False, msg="Failed to call OVH API: {0}".format(apiError))
-		# if module.check_mode:
-		# 	module.exit_json(changed=True, msg="Installation in progress on %s ! - (dry run mode)" % module.params['name'])
+		cloud_id = get_cloud_id(ovhclient, module, module.params['name'])
+		# get_flavor_id and get_image_id fail with the available names when they do not exist
 		details = {
-			'flavorId'=get_flavor_id(ovhclient, module, module.params['name'], module.params['region'], module.params['flavor']), # Instance flavor id (type: string)
-#			'groupId'=None, // Start instance in group (type: string)
-			'imageId'=get_image_id(ovhclient, module, module.params['name'], module.params['region'], module.params['image']) #, // Instance image id (type: string)
-			'monthlyBilling'=False, // Active monthly billing (type: boolean)
+			'flavorId':get_flavor_id(ovhclient, module, cloud_id, module.params['region'], module.params['flavor']), # Instance flavor id (type: string)
+#			'groupId':None, # Start instance in group (type: string)
+			'imageId':get_image_id(ovhclient, module, cloud_id, module.params['region'], module.params['image']), # Instance image id (type: string)
+			'monthlyBilling':False, # Active monthly billing (type: boolean)
 			'name':module.params['hostname'], # Instance name (type: string)
-			'networks'=None, // Create network interfaces (type: cloud.instance.NetworkParams[])
-			'region'=module.params['region'], // Instance region (type: string)
-			#'userData'=None, // Configuration information or scripts to use upon launch (type: text)
-			#'volumeId'=None, // Specify a volume id to boot from it (type: string)			
+			'region':module.params['region'], # Instance region (type: string)
+			#'userData'=None, # Configuration information or scripts to use upon launch (type: text)
+			#'volumeId'=None, # Specify a volume id to boot from it (type: string)
 			}
 		if module.params['sshkey']:
-			details['sshKeyId'] = get_sshkey_id(ovhclient, module, module.params['name'], module.params['region'], module.params['sshkey'])
+			details['sshKeyId'] = get_sshkey_id(ovhclient, module, cloud_id, module.params['sshkey'])
+		if module.check_mode:
+			module.exit_json(changed=True, msg="Instance %s created in %s ! - (dry run mode)" % (module.params['hostname'], module.params['name']))
 		try:
-			ovhclient.post('/cloud/project/%s/instance' % cloud_id,
+			result = ovhclient.post('/cloud/project/%s/instance' % cloud_id,
 					**details)
-			module.exit_json(changed=True, msg="Installation in progress on %s !" % module.params['name'])
+			module.exit_json(changed=True, msg="Instance %s created in %s !" % (module.params['hostname'], module.params['name']), instance=result)
 		except APIError as apiError:
 			module.fail_json(changed=False, msg="Failed to call OVH API: {0}".format(apiError))
 	else:
-		if not module.params['name']:
-			module.fail_json(changed=False, msg="Please give the service's name you want to install")
-		if not module.params['template']:
-			module.fail_json(changed=False, msg="Please give a template to install")
 		if not module.params['hostname']:
-			module.fail_json(changed=False, msg="Please give a hostname for your installation")
+			module.fail_json(changed=False, msg="Please give a hostname for your instance")
+		for aparam in ['image', 'region', 'flavor']:
+			if not module.params[aparam]:
+				module.fail_json(changed=False, msg="Please give the %s of your instance" % aparam)
+
+# Function of the dedicated server tasks of an installation
+INSTALL_TASK = 'reinstallServer'
+
+def getInstallProgress(ovhclient, name):
+	"""Return install progress of a dedicated server as a dict (status, step, steps, comment)"""
+	try:
+		install = ovhclient.get('/dedicated/server/%s/install/status' % name)
+		steps = install['progress']
+		done = [astep for astep in steps if astep['status'] == 'done']
+		errors = [astep for astep in steps if astep['status'] == 'error']
+		current = [astep for astep in steps if astep['status'] == 'doing']
+		if errors:
+			status = 'error'
+			comment = errors[0]['error'] or errors[0]['comment']
+		else:
+			status = 'done' if len(done) == len(steps) else 'doing'
+			if current:
+				comment = current[0]['comment']
+			elif done:
+				comment = done[-1]['comment']
+			else:
+				comment = ''
+		return dict(status=status, step=len(done), steps=len(steps), comment=comment, elapsedTime=install.get('elapsedTime'))
+	except ovh.exceptions.ResourceNotFoundError:
+		# No installation running: the last installation task tells whether it succeeded.
+		# Right after launchInstall it may not exist yet, another task (e.g. a reboot) says nothing
+		tasks = ovhclient.get('/dedicated/server/%s/task' % name, function=INSTALL_TASK)
+		if not tasks:
+			return dict(status='doing', step=0, steps=0, comment='Installation not started yet')
+		task = ovhclient.get('/dedicated/server/%s/task/%s' % (name, max(tasks)))
+		if task.get('function') != INSTALL_TASK:
+			return dict(status='doing', step=0, steps=0, comment='Installation not started yet')
+		status = {'done': 'done', 'error': 'error', 'cancelled': 'error', 'customerError': 'error', 'ovhError': 'error'}.get(task['status'], 'doing')
+		return dict(status=status, step=0, steps=0, comment=task['comment'])
+
+def waitInstall(ovhclient, module):
+	names = [atarget['name'] if isinstance(atarget, dict) else atarget for atarget in module.params['targets']]
+	if not names and module.params['name']:
+		names = [module.params['name']]
+	if not names:
+		module.fail_json(changed=False, msg="Please give the servers you want to wait the installation of")
+	if module.check_mode:
+		module.exit_json(changed=False, msg="done - (dry run mode)")
+	start = time.time()
+	deadline = start + module.params['timeout']
+	results = dict((name, dict(status='doing', step=0, steps=0, comment='')) for name in names)
+	delay = 10
+	while True:
+		pending = [name for name in names if results[name]['status'] == 'doing']
+		def poll(name):
+			try:
+				return name, getInstallProgress(ovhclient, name)
+			except APIError as apiError:
+				return name, dict(status='error', step=0, steps=0, comment="Failed to call OVH API: {0}".format(apiError))
+		progressed = False
+		for name, progress in run_parallel(poll, pending, module.params['workers']):
+			if (progress['status'], progress['step']) != (results[name]['status'], results[name]['step']):
+				progressed = True
+			if progress['status'] != 'doing':
+				progress['duration'] = int(time.time() - start)
+			results[name] = progress
+		failed = sorted(name for name in names if results[name]['status'] == 'error')
+		if failed:
+			module.fail_json(changed=False, msg="Installation failed on %s" % ', '.join(failed), results=results)
+		if all(results[name]['status'] == 'done' for name in names):
+			module.exit_json(changed=False, msg="Installation successful on %s servers" % len(names), duration=int(time.time() - start), results=results)
+		if time.time() + delay > deadline:
+			module.fail_json(changed=False, msg="Timeout while waiting for installations", results=results)
+		# Poll more often while installations are moving, back off otherwise
+		delay = 10 if progressed else min(delay * 1.5, 60)
+		time.sleep(delay)
+
+FLEET_SERVICES = ['boot', 'monitoring', 'reverse', 'install']
+BOOT_IDS = { 'harddisk':1, 'rescue':1122 }
+# Options each target of a service needs
+FLEET_REQUIRED = {'reverse': ['domain', 'ip'], 'install': ['template', 'hostname']}
+
+def getFleetTargets(module):
+	targets = []
+	for atarget in module.params['targets']:
+		params = dict(module.params)
+		if isinstance(atarget, dict):
+			params.update(atarget)
+		else:
+			params['name'] = atarget
+		if not params.get('name'):
+			module.fail_json(changed=False, msg="Each target needs a name")
+		targets.append(params)
+	return targets
+
+def checkFleetTarget(ovhclient, service, params):
+	"""Return the change needed on a dedicated server, None when it is already as asked"""
+	if service == 'boot':
+		server = ovhclient.get('/dedicated/server/%s' % params['name'])
+		params['change_boot'] = BOOT_IDS[params['boot']] != server['bootId']
+		if params['change_boot']:
+			return "set to boot on %s. Reboot in progress..." % params['boot']
+		if params['force_reboot'] in BOOLEANS_TRUE:
+			return "reboot in progress..."
+	elif service == 'monitoring':
+		server = ovhclient.get('/dedicated/server/%s' % params['name'])
+		if server['monitoring'] != (params['state'] == 'present'):
+			return "monitoring %s" % params['state']
+	elif service == 'reverse':
+		fqdn = params['name'] + '.' + params['domain'] + '.'
+		try:
+			reverse = ovhclient.get('/ip/%s/reverse/%s' % (params['ip'], params['ip']))['reverse']
+		except ovh.exceptions.ResourceNotFoundError:
+			reverse = ''
+		if reverse != fqdn:
+			return "reverse %s to %s" % (params['ip'], fqdn)
+	elif service == 'install':
+		try:
+			ovhclient.get('/dedicated/server/%s/install/status' % params['name'])
+			# An installation is already running
+			return None
+		except ovh.exceptions.ResourceNotFoundError:
+			return "installation of %s" % params['template']
+	return None
+
+def applyFleetTarget(ovhclient, service, params):
+	if service == 'boot':
+		if params['change_boot']:
+			ovhclient.put('/dedicated/server/%s' % params['name'],
+					bootId=BOOT_IDS[params['boot']])
+		ovhclient.post('/dedicated/server/%s/reboot' % params['name'])
+	elif service == 'monitoring':
+		ovhclient.put('/dedicated/server/%s' % params['name'],
+				monitoring=params['state'] == 'present')
+	elif service == 'reverse':
+		ovhclient.post('/ip/%s/reverse' % params['ip'],
+				ipReverse=params['ip'],
+				reverse=params['name'] + '.' + params['domain'] + '.')
+	elif service == 'install':
+		details = {"details":{"language":"en","customHostname":params['hostname']},"templateName":params['template']}
+		ovhclient.post('/dedicated/server/%s/install/start' % params['name'],
+				**details)
+
+def changeFleet(ovhclient, module):
+	service = module.params['service']
+	if service not in FLEET_SERVICES:
+		module.fail_json(changed=False, msg="targets are only supported by %s services" % ', '.join(FLEET_SERVICES))
+	targets = getFleetTargets(module)
+	if service == 'monitoring' and module.params['state'] not in ['present', 'absent']:
+		module.fail_json(changed=False, msg="State %s does not match 'present' or 'absent'" % module.params['state'])
+	results = {}
+	# A target missing an option fails alone, like changeReverse and launchInstall would
+	for params in targets:
+		absent = [aparam for aparam in FLEET_REQUIRED.get(service, []) if params.get(aparam) in [None, '', 'None']]
+		if absent:
+			results[params['name']] = dict(changed=False, failed=True, msg="Please give a %s to %s" % (' and a '.join(absent), params['name']))
+	targets = [params for params in targets if params['name'] not in results]
+	if service == 'install' and targets:
+		try:
+			templates = ovhclient.get('/me/installationTemplate')
+		except APIError as apiError:
+			module.fail_json(changed=False, msg="Failed to call OVH API: {0}".format(apiError))
+		for params in targets:
+			if params['template'] not in templates:
+				module.fail_json(changed=False, msg="%s doesn't exist in personal templates" % params['template'])
+	def check(params):
+		try:
+			return params, checkFleetTarget(ovhclient, service, params), None
+		except APIError as apiError:
+			return params, None, "Failed to call OVH API: {0}".format(apiError)
+	to_change = []
+	for params, change, error in run_parallel(check, targets, module.params['workers']):
+		if error:
+			results[params['name']] = dict(changed=False, failed=True, msg=error)
+		elif change is None:
+			results[params['name']] = dict(changed=False, msg="%s already configured" % params['name'])
+		else:
+			results[params['name']] = dict(changed=True, msg="%s: %s" % (params['name'], change))
+			to_change.append(params)
+	if not module.check_mode:
+		def apply(params):
+			try:
+				applyFleetTarget(ovhclient, service, params)
+				return params, None
+			except APIError as apiError:
+				return params, "Failed to call OVH API: {0}".format(apiError)
+		for params, error in run_parallel(apply, to_change, module.params['workers']):
+			if error:
+				results[params['name']] = dict(changed=False, failed=True, msg=error)
+	changed = any(aresult['changed'] for aresult in results.values())
+	failed = sorted(name for name, aresult in results.items() if aresult.get('failed'))
+	if failed:
+		module.fail_json(changed=changed, msg="%s failed on %s" % (service, ', '.join(failed)), results=results)
+	module.exit_json(changed=changed, msg="%s changed on %s servers" % (service, len(to_change)), results=results)
 
 def main():
 	module = AnsibleModule(
 			argument_spec = dict(
 				state = dict(default='present', choices=['present', 'absent', 'modified']),
-				name  = dict(required=True),
-				service = dict(choices=['boot', 'dns', 'vrack', 'reverse', 'monitoring', 'install', 'status', 'list', 'template', 'terminate', 'cloud', 'instance'], required=True),
+				name  = dict(required=False),
+				targets = dict(required=False, default=[], type='list'),
+				workers = dict(required=False, default=10, type='int'),
+				timeout = dict(required=False, default=3600, type='int'),
+				service = dict(choices=['boot', 'dns', 'vrack', 'reverse', 'monitoring', 'install', 'status', 'install_wait', 'list', 'template', 'terminate', 'cloud', 'instance'], required=True),
 				domain = dict(required=False, default='None'),
 				ip    = dict(required=False, default='None'),
 				vrack = dict(required=False, default='None'),
@@ -603,6 +1133,20 @@ def main():
 				force_reboot = dict(required=False, default='no', choices=BOOLEANS),
 				template = dict(required=False, default='None'),
 				hostname = dict(required=False, default='None'),
+				project_id = dict(required=False, default=None),
+				fields = dict(required=False, default=[], type='list'),
+				filters = dict(required=False, default={}, type='dict'),
+				output_file = dict(required=False, default=None),
+				region = dict(required=False, default=None),
+				flavor = dict(required=False, default=None),
+				image = dict(required=False, default=None),
+				sshkey = dict(required=False, default=None),
+				refresh = dict(default='now', choices=['now', 'deferred']),
+				refresh_journal = dict(required=False, default=None),
+				reverses = dict(required=False, default=None, type='raw'),
+				block = dict(required=False, default=None),
+				reverse_format = dict(required=False, default=None),
+				check_forward = dict(required=False, default=False, type='bool'),
 				endpoint = dict(required=True),
 				application_key = dict(required=True, no_log=True),
 				application_secret = dict(required=True, no_log=True),
@@ -616,6 +1160,14 @@ def main():
 		client = get_ovh_client(module)
 	except APIError as apiError:
 		module.fail_json(changed=False, msg="Failed to call OVH API: {0}".format(apiError))
+	if module.params['service'] == 'install_wait':
+		waitInstall(client, module)
+	if module.params['service'] == 'reverse' and (module.params['reverses'] or module.params['block']):
+		changeReverses(client, module)
+	if module.params['targets']:
+		changeFleet(client, module)
+	if not module.params['name']:
+		module.fail_json(changed=False, msg="name is required")
 	if module.params['service'] == 'dns':
 		changeDNS(client, module)
 	elif module.params['service'] == 'vrack':
@@ -632,6 +1184,8 @@ def main():
 		getStatusInstall(client, module)
 	elif module.params['service'] == 'cloud':
 		create_cloud(client, module)
+	elif module.params['service'] == 'instance':
+		createInstance(client, module)
 	elif module.params['service'] == 'list':
 		if module.params['name'] == 'dedicated':
 			listDedicated(client, module)
@@ -641,6 +1195,10 @@ def main():
 			listCloud(client, module)			
 		elif module.params['name'] == 'instance':
 			listInstance(client, module)						
+		elif module.params['name'] == 'records':
+			listRecords(client, module)
+		elif module.params['name'] == 'ip':
+			listIP(client, module)
 		else:
 			module.fail_json(changed=False, msg="%s not supported for 'list' service" % module.params['name'])
 	elif module.params['service'] == 'template':
@@ -650,4 +1208,4 @@ def main():
 	
 
 if __name__ == '__main__':
-	    main()
+	    run_module(main)
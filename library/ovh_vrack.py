@@ -38,6 +38,26 @@ options:
         choices: ['present', 'absent']
         description:
             - Determines whether the ssh key has to be created/modified or deleted
+    cloud:
+        required: false
+        default: None
+        description:
+            - The name of a cloud project to attach to / detach from the vrack
+    clouds:
+        required: false
+        default: []
+        description:
+            - List of cloud project names to attach to / detach from the vrack (done concurrently)
+    wait:
+        required: false
+        default: true
+        description:
+            - Wait until vrack tasks of attach / detach operations are finished
+    wait_timeout:
+        required: false
+        default: 600
+        description:
+            - How many seconds to wait for vrack tasks
     endpoint:
         required: false
         default: None
@@ -72,19 +92,15 @@ EXAMPLES = '''
 # Add/modifed a key
 - name: Remove a key
   ovh_cloud_ssh_keys: name='ssh-rsa *****' publicKey='VRACK ID' state='absent' cloud_name='MyCloud'
+
+# Attach several cloud projects to a vrack and wait for the attachment
+- name: Attach clouds
+  ovh_vrack: name='MyVrack' state='attached' clouds="['MyCloud', 'MyOtherCloud']"
 '''
 
 RETURN = ''' # '''
 
-import ast
-import yaml
-
-try:
-    import json
-except ImportError:
-    import simplejson as json
-
-from ansible.module_utils.ovh_utils import HAS_OVH, get_ovh_client, get_cloud_id, APIError, get_vrack, create_new_vrack
+from ansible.module_utils.ovh_utils import HAS_OVH, get_ovh_client, get_cloud_index, APIError, get_vrack, create_new_vrack, run_parallel, wait_vrack_tasks, run_module
 
 # For Ansible < 2.1
 # Still works on Ansible 2.2.0
@@ -101,6 +117,9 @@ def main():
                 name=dict(required=True),
                 description=dict(required=False, default=''),
                 cloud=dict(required=False, default=None),
+                clouds=dict(required=False, default=[], type='list'),
+                wait=dict(required=False, default=True, type='bool'),
+                wait_timeout=dict(required=False, default=600, type='int'),
                 endpoint=dict(required=False, default=None),
                 application_key=dict(required=False, default=None, no_log=True),
                 application_secret=dict(required=False, default=None, no_log=True),
@@ -139,25 +158,36 @@ def main():
                 except APIError as apiError:
                     module.fail_json(changed=False, msg="Failed to call OVH API on delete: {0}".format(apiError))       
     if module.params['state'] in ['attached', 'detached']:
+        cloud_names = list(module.params['clouds'])
         if module.params['cloud']:
-            cloud_id = get_cloud_id(client, module,module.params['cloud'])
-            cloud_attached = client.get('/vrack/%s/cloudProject' % existing_vrack['id'])
-            if cloud_id in cloud_attached:
-                if module.params['state'] == 'detached':
-                    try:
-                        client.delete('/vrack/%s/cloudProject/%s' % (existing_vrack['id'], cloud_id))         
-                        result['changed'] = True
-                        result['msg'] += 'VRack detached. '
-                    except APIError as apiError:
-                        module.fail_json(changed=False, msg="Failed to call OVH API on detach: {0}".format(apiError))                           
+            cloud_names.append(module.params['cloud'])
+        if cloud_names:
+            cloud_index = get_cloud_index(client, module)
+            unknown_clouds = [acloud for acloud in cloud_names if acloud not in cloud_index]
+            if unknown_clouds:
+                module.fail_json(changed=False, msg="Clouds specified do not exist : %s" % ', '.join(unknown_clouds))
+            cloud_ids = set(cloud_index[acloud]['project_id'] for acloud in cloud_names)
+            try:
+                cloud_attached = set(client.get('/vrack/%s/cloudProject' % existing_vrack['id']))
+            except APIError as apiError:
+                module.fail_json(changed=False, msg="Failed to call OVH API on get cloudProject: {0}".format(apiError))
+            if module.params['state'] == 'attached':
+                to_change = sorted(cloud_ids.difference(cloud_attached))
+                change_vrack = lambda cloud_id: client.post('/vrack/%s/cloudProject' % (existing_vrack['id']), project=cloud_id)
             else:
-                if module.params['state'] == 'attached':
-                    try:
-                        client.post('/vrack/%s/cloudProject' % (existing_vrack['id']), project=cloud_id)
-                        result['changed'] = True
-                        result['msg'] += 'VRack attached. '
-                    except APIError as apiError:
-                        module.fail_json(changed=False, msg="Failed to call OVH API on attach: {0}".format(apiError))                           
+                to_change = sorted(cloud_ids.intersection(cloud_attached))
+                change_vrack = lambda cloud_id: client.delete('/vrack/%s/cloudProject/%s' % (existing_vrack['id'], cloud_id))
+            if to_change:
+                if module.check_mode:
+                    module.exit_json(changed=False, msg="VRack has to be %s" % module.params['state'], clouds=to_change)
+                try:
+                    tasks = run_parallel(change_vrack, to_change)
+                    result['changed'] = True
+                    result['msg'] += 'VRack %s. ' % module.params['state']
+                except APIError as apiError:
+                    module.fail_json(changed=False, msg="Failed to call OVH API on {0}: {1}".format(module.params['state'], apiError))                           
+                if module.params['wait']:
+                    wait_vrack_tasks(client, module, existing_vrack['id'], [atask['id'] for atask in tasks if atask], module.params['wait_timeout'])
         else:
             module.fail_json(changed=False, msg="A cloudProject, dedicatedServer, dedicatedCloud is needed to attach a vrack")       
     module.exit_json(**result)
@@ -166,4 +196,4 @@ def main():
     
 
 if __name__ == '__main__':
-        main()
+        run_module(main)
@@ -0,0 +1,232 @@
+#!/usr/bin/env python
+
+ANSIBLE_METADATA = {
+    'metadata_version': '1.0',
+    'supported_by': 'community',
+    'status': ['preview']
+        }
+
+DOCUMENTATION = '''
+---
+module: ssh_host_keys
+short_description: Wait for SSH on many hosts and save their host keys
+description:
+    - Probe the SSH port and banner of all hosts concurrently until they answer or their deadline is reached
+    - Scan the host keys of the hosts which are ready with a single ssh-keyscan call
+    - Merge the keys into known_hosts in a single locked write
+author: Julien Couturier
+notes:
+    - Runs on the ansible controller (use it in a localhost play)
+requirements:
+    - python >= 3.5
+    - ssh-keyscan
+options:
+    hosts:
+        required: true
+        description: Names of the hosts to wait for
+    port:
+        required: false
+        default: 22
+        description:
+            - SSH port of the hosts
+    timeout:
+        required: false
+        default: 300
+        description:
+            - Maximum number of seconds to wait for each host
+    connect_timeout:
+        required: false
+        default: 5
+        description:
+            - Maximum number of seconds of each connection attempt
+    known_hosts:
+        required: false
+        default: ~/.ssh/known_hosts
+        description:
+            - known_hosts file to update
+    hash:
+        required: false
+        default: true
+        description:
+            - Hash host names in known_hosts (like ssh-keyscan -H)
+    replace:
+        required: false
+        default: false
+        description:
+            - Replace the keys of hosts already in known_hosts (e.g. after a reinstallation).
+              When false, only unknown hosts are added
+'''
+
+EXAMPLES = '''
+- name: Wait for hosts and save their keys
+  ssh_host_keys:
+    hosts: "{{ groups['all'] }}"
+    timeout: 300
+'''
+
+RETURN = '''
+hosts:
+    description: Per host readiness, banner and time to be ready (seconds)
+    returned: always
+    type: dict
+added:
+    description: Hosts whose keys were added to known_hosts
+    returned: success
+    type: list
+'''
+
+import asyncio
+import base64
+import fcntl
+import hashlib
+import hmac
+import os
+import tempfile
+import time
+
+# For Ansible < 2.1
+# Still works on Ansible 2.2.0
+from ansible.module_utils.basic import *
+
+# For Ansible >= 2.1
+# bug: doesn't work with ansible 2.2.0
+# from ansible.module_utils.basic import AnsibleModule
+
+async def wait_for_ssh(host, port, timeout, connect_timeout):
+    """Try to read the SSH banner of host until it answers or timeout is reached"""
+    start = time.time()
+    deadline = start + timeout
+    error = None
+    while True:
+        try:
+            reader, writer = await asyncio.wait_for(asyncio.open_connection(host, port), connect_timeout)
+            try:
+                banner = await asyncio.wait_for(reader.readline(), connect_timeout)
+            finally:
+                writer.close()
+                # The transport is closed before the loop ends (wait_closed is not in python 3.6)
+                if hasattr(writer, 'wait_closed'):
+                    await writer.wait_closed()
+            if banner.startswith(b'SSH-'):
+                return dict(ready=True, banner=banner.strip().decode('ascii', 'replace'), elapsed=round(time.time() - start, 1))
+            error = "Unexpected banner %r" % banner
+        except (OSError, asyncio.TimeoutError) as exc:
+            error = str(exc) or exc.__class__.__name__
+        remaining = deadline - time.time()
+        if remaining <= 0:
+            return dict(ready=False, msg=error, elapsed=round(time.time() - start, 1))
+        await asyncio.sleep(min(2, remaining))
+
+def wait_for_all(hosts, port, timeout, connect_timeout):
+    """Probe all hosts together: the whole wait lasts as long as the slowest host"""
+    async def wait_all():
+        return await asyncio.gather(*[wait_for_ssh(ahost, port, timeout, connect_timeout) for ahost in hosts])
+    loop = asyncio.new_event_loop()
+    try:
+        results = loop.run_until_complete(wait_all())
+    finally:
+        loop.close()
+    return dict(zip(hosts, results))
+
+def known_host_name(host, port):
+    return host if port == 22 else '[%s]:%s' % (host, port)
+
+def hash_host(name, salt=None):
+    salt = salt if salt is not None else os.urandom(20)
+    digest = hmac.new(salt, name.encode('utf-8'), hashlib.sha1).digest()
+    return '|1|%s|%s' % (base64.b64encode(salt).decode('ascii'), base64.b64encode(digest).decode('ascii'))
+
+def line_hosts_match(hosts_field, names):
+    """Tell if the host field of a known_hosts line refers to one of names"""
+    for anentry in hosts_field.split(','):
+        if anentry.startswith('|1|'):
+            try:
+                salt = base64.b64decode(anentry.split('|')[2])
+            except (IndexError, ValueError, TypeError):
+                continue
+            if any(hmac.compare_digest(hash_host(aname, salt), anentry) for aname in names):
+                return True
+        elif anentry in names:
+            return True
+    return False
+
+def scan_keys(module, hosts, port, connect_timeout):
+    """Return the ssh-keyscan lines of all hosts, by host"""
+    cmd = [module.get_bin_path('ssh-keyscan', True), '-T', str(connect_timeout), '-p', str(port)] + list(hosts)
+    rc, out, err = module.run_command(cmd)
+    keys = dict((ahost, []) for ahost in hosts)
+    names = dict((known_host_name(ahost, port), ahost) for ahost in hosts)
+    for aline in out.splitlines():
+        fields = aline.split()
+        if len(fields) < 3 or aline.startswith('#') or fields[0] not in names:
+            continue
+        keys[names[fields[0]]].append(fields[1:])
+    return keys
+
+def merge_known_hosts(module, path, port, keys, hash_names, replace):
+    """Add the keys to known_hosts under a lock, return the hosts added"""
+    directory = os.path.dirname(path)
+    if directory and not os.path.isdir(directory):
+        os.makedirs(directory, 0o700)
+    with open(path + '.lock', 'w') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        lines = []
+        if os.path.exists(path):
+            with open(path) as stream:
+                lines = stream.read().splitlines()
+        added = []
+        for ahost, host_keys in sorted(keys.items()):
+            if not host_keys:
+                continue
+            names = [known_host_name(ahost, port)]
+            known = [aline for aline in lines if aline.strip() and not aline.startswith('#') and line_hosts_match(aline.split()[0], names)]
+            if known and not replace:
+                continue
+            lines = [aline for aline in lines if aline not in known]
+            for akey in host_keys:
+                host_field = hash_host(names[0]) if hash_names else names[0]
+                lines.append(' '.join([host_field] + akey))
+            added.append(ahost)
+        if added and not module.check_mode:
+            fd, tmp_path = tempfile.mkstemp(dir=directory or '.')
+            with os.fdopen(fd, 'w') as stream:
+                stream.write('\n'.join(lines) + '\n')
+            if os.path.exists(path):
+                os.chmod(tmp_path, os.stat(path).st_mode & 0o777)
+            os.rename(tmp_path, path)
+    return added
+
+def main():
+    module = AnsibleModule(
+            argument_spec=dict(
+                hosts=dict(required=True, type='list'),
+                port=dict(required=False, default=22, type='int'),
+                timeout=dict(required=False, default=300, type='int'),
+                connect_timeout=dict(required=False, default=5, type='int'),
+                known_hosts=dict(required=False, default='~/.ssh/known_hosts'),
+                hash=dict(required=False, default=True, type='bool'),
+                replace=dict(required=False, default=False, type='bool'),
+                ),
+            supports_check_mode=True
+            )
+    hosts = module.params['hosts']
+    port = module.params['port']
+    start = time.time()
+    results = wait_for_all(hosts, port, module.params['timeout'], module.params['connect_timeout'])
+    not_ready = sorted(ahost for ahost, aresult in results.items() if not aresult['ready'])
+    if not_ready:
+        module.fail_json(changed=False, msg="SSH is not available on %s" % ', '.join(not_ready), hosts=results)
+    keys = scan_keys(module, hosts, port, module.params['connect_timeout'])
+    no_key = sorted(ahost for ahost, host_keys in keys.items() if not host_keys)
+    if no_key:
+        module.fail_json(changed=False, msg="No host key found for %s" % ', '.join(no_key), hosts=results)
+    path = os.path.expanduser(module.params['known_hosts'])
+    try:
+        added = merge_known_hosts(module, path, port, keys, module.params['hash'], module.params['replace'])
+    except (IOError, OSError) as error:
+        module.fail_json(changed=False, msg="Failed to update %s: %s" % (path, error), hosts=results)
+    module.exit_json(changed=len(added) > 0, hosts=results, added=added, elapsed=round(time.time() - start, 1))
+
+
+if __name__ == '__main__':
+        main()
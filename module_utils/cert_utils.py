@@ -0,0 +1,136 @@
+#!/usr/bin/env python
+
+import os
+import tempfile
+
+try:
+    from cryptography import x509
+    from cryptography.hazmat.backends import default_backend
+    from cryptography.hazmat.primitives import hashes, serialization
+    from cryptography.hazmat.primitives.asymmetric import ec, rsa
+    HAS_CRYPTOGRAPHY = True
+except ImportError:
+    HAS_CRYPTOGRAPHY = False
+
+# Curves usable with type ECC (names of openssl_privatekey)
+CURVES = ['secp256r1', 'secp384r1', 'secp521r1']
+# CSR options giving the subject of the certificate, like openssl_csr
+SUBJECT_FIELDS = [('country_name', 'COUNTRY_NAME'), ('state_or_province_name', 'STATE_OR_PROVINCE_NAME'),
+                  ('organization_name', 'ORGANIZATION_NAME'), ('organizational_unit_name', 'ORGANIZATIONAL_UNIT_NAME'),
+                  ('common_name', 'COMMON_NAME'), ('email_address', 'EMAIL_ADDRESS')]
+# key_usage values (short or openssl names, case and spaces ignored) and their KeyUsage argument
+KEY_USAGES = {'digitalsignature': 'digital_signature', 'nonrepudiation': 'content_commitment',
+              'contentcommitment': 'content_commitment', 'keyencipherment': 'key_encipherment',
+              'dataencipherment': 'data_encipherment', 'keyagreement': 'key_agreement',
+              'keycertsign': 'key_cert_sign', 'certificatesign': 'key_cert_sign', 'certificatesigning': 'key_cert_sign',
+              'crlsign': 'crl_sign', 'encipheronly': 'encipher_only', 'decipheronly': 'decipher_only',
+              'signature': 'digital_signature', 'encipherment': 'key_encipherment'}
+# extended_key_usage values and their ExtendedKeyUsageOID
+EXTENDED_KEY_USAGES = {'serverauth': 'SERVER_AUTH', 'serverauthentication': 'SERVER_AUTH', 'tlswebserverauthentication': 'SERVER_AUTH',
+                       'clientauth': 'CLIENT_AUTH', 'clientauthentication': 'CLIENT_AUTH', 'tlswebclientauthentication': 'CLIENT_AUTH',
+                       'codesigning': 'CODE_SIGNING', 'emailprotection': 'EMAIL_PROTECTION',
+                       'timestamping': 'TIME_STAMPING', 'ocspsigning': 'OCSP_SIGNING'}
+
+
+def get_names(common_name, subject_alt_name):
+    """Return the sorted SAN set of a certificate request"""
+    names = set([common_name.lower()])
+    for aname in split_list(subject_alt_name):
+        if aname.startswith('DNS:'):
+            names.add(aname[4:].lower())
+        elif ':' not in aname:
+            names.add(aname.lower())
+    return sorted(names)
+
+def split_list(value):
+    """Return the items of a YAML list or of a comma separated string"""
+    if isinstance(value, str):
+        value = value.split(',')
+    return [anitem.strip() for anitem in value or [] if anitem.strip()]
+
+def usage_key(name):
+    return name.replace(' ', '').replace('_', '').lower()
+
+def write_file(path, content, mode=0o600):
+    """Write path atomically: readers see the old file or the new one, never a partial one"""
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or '.')
+    with os.fdopen(fd, 'wb' if isinstance(content, bytes) else 'w') as stream:
+        stream.write(content)
+    os.chmod(tmp_path, mode)
+    os.rename(tmp_path, path)
+
+def public_key_bytes(key):
+    return key.public_key().public_bytes(serialization.Encoding.DER, serialization.PublicFormat.SubjectPublicKeyInfo)
+
+def load_private_key(path, passphrase=None):
+    with open(path, 'rb') as stream:
+        return serialization.load_pem_private_key(stream.read(), passphrase.encode('utf-8') if passphrase else None, default_backend())
+
+def key_matches(key, spec):
+    if spec['type'] == 'ECC':
+        return isinstance(key, ec.EllipticCurvePrivateKey) and key.curve.name == spec['curve']
+    return isinstance(key, rsa.RSAPrivateKey) and key.key_size == spec['size']
+
+def generate_private_key(spec):
+    if spec['type'] == 'ECC':
+        return ec.generate_private_key(getattr(ec, spec['curve'].upper())(), default_backend())
+    return rsa.generate_private_key(public_exponent=65537, key_size=spec['size'], backend=default_backend())
+
+def build_subject(spec):
+    return x509.Name([x509.NameAttribute(getattr(x509.NameOID, oid), spec[field])
+                      for field, oid in SUBJECT_FIELDS if spec.get(field)])
+
+def build_extensions(spec):
+    """Return the CSR extensions of spec: names, then key usages when asked"""
+    extensions = [x509.SubjectAlternativeName([x509.DNSName(aname) for aname in get_names(spec['common_name'], spec.get('subject_alt_name'))])]
+    key_usages = [KEY_USAGES[usage_key(ausage)] for ausage in split_list(spec.get('key_usage'))]
+    if key_usages:
+        extensions.append(x509.KeyUsage(**dict((ausage, ausage in key_usages) for ausage in sorted(set(KEY_USAGES.values())))))
+    extended_key_usages = [getattr(x509.ExtendedKeyUsageOID, EXTENDED_KEY_USAGES[usage_key(ausage)])
+                           for ausage in split_list(spec.get('extended_key_usage'))]
+    if extended_key_usages:
+        extensions.append(x509.ExtendedKeyUsage(extended_key_usages))
+    return extensions
+
+def csr_matches(csr, key, spec):
+    if public_key_bytes(csr) != public_key_bytes(key) or csr.subject != build_subject(spec):
+        return False
+    return sorted(str(anextension.value) for anextension in csr.extensions) == sorted(str(anextension) for anextension in build_extensions(spec))
+
+def ensure_key_and_csr(spec, check_mode=False):
+    """Create the key and the CSR of spec when they are missing or do not match it.
+    Runs in a worker process: errors are returned, not raised"""
+    result = dict(common_name=spec['common_name'], key_changed=False, csr_changed=False)
+    try:
+        key = None
+        if os.path.exists(spec['privatekey_path']):
+            key = load_private_key(spec['privatekey_path'], spec.get('passphrase'))
+            if not key_matches(key, spec):
+                key = None
+        if key is None:
+            result['key_changed'] = True
+            if check_mode:
+                result['csr_changed'] = True
+                return result
+            key = generate_private_key(spec)
+            encryption = serialization.BestAvailableEncryption(spec['passphrase'].encode('utf-8')) if spec.get('passphrase') else serialization.NoEncryption()
+            write_file(spec['privatekey_path'], key.private_bytes(serialization.Encoding.PEM, serialization.PrivateFormat.TraditionalOpenSSL, encryption))
+        if not result['key_changed'] and os.path.exists(spec['csr_path']):
+            with open(spec['csr_path'], 'rb') as stream:
+                if csr_matches(x509.load_pem_x509_csr(stream.read(), default_backend()), key, spec):
+                    return result
+        result['csr_changed'] = True
+        if check_mode:
+            return result
+        builder = x509.CertificateSigningRequestBuilder().subject_name(build_subject(spec))
+        for anextension in build_extensions(spec):
+            builder = builder.add_extension(anextension, critical=False)
+        csr = builder.sign(key, hashes.SHA256(), default_backend())
+        write_file(spec['csr_path'], csr.public_bytes(serialization.Encoding.PEM), 0o644)
+    except KeyError as error:
+        result['failed'] = True
+        result['msg'] = '%s: unknown usage %s' % (spec['common_name'], error)
+    except (IOError, OSError, ValueError, TypeError) as error:
+        result['failed'] = True
+        result['msg'] = '%s: %s' % (spec['common_name'], error)
+    return result
@@ -0,0 +1,180 @@
+#!/usr/bin/env python
+
+import asyncio
+import random
+import socket
+import struct
+import time
+
+# DNS record types understood by the query helpers
+RECORD_TYPES = {'A': 1, 'NS': 2, 'CNAME': 5, 'MX': 15, 'TXT': 16, 'AAAA': 28}
+DNS_PORT = 53
+
+
+class DNSError(Exception):
+    pass
+
+
+def build_query(name, rtype, query_id=None):
+    """Return a DNS query packet (without recursion: name servers are asked directly)"""
+    query_id = random.randint(0, 0xffff) if query_id is None else query_id
+    question = b''
+    for alabel in name.rstrip('.').split('.'):
+        alabel = alabel.encode('idna') if alabel else b''
+        question += struct.pack('!B', len(alabel)) + alabel
+    question += b'\0' + struct.pack('!HH', RECORD_TYPES[rtype], 1)
+    return struct.pack('!HHHHHH', query_id, 0, 1, 0, 0, 0) + question
+
+def read_name(packet, offset):
+    """Read a (maybe compressed) domain name, return it with the offset following it"""
+    labels = []
+    end = None
+    for _ in range(128):
+        length = packet[offset]
+        if length & 0xc0 == 0xc0:
+            if end is None:
+                end = offset + 2
+            offset = struct.unpack('!H', packet[offset:offset + 2])[0] & 0x3fff
+            continue
+        if length == 0:
+            return '.'.join(labels), end if end is not None else offset + 1
+        labels.append(packet[offset + 1:offset + 1 + length].decode('ascii', 'replace'))
+        offset += 1 + length
+    raise DNSError('Too many labels in name')
+
+def decode_rdata(packet, offset, length, rtype):
+    rdata = packet[offset:offset + length]
+    if rtype == RECORD_TYPES['A']:
+        return socket.inet_ntop(socket.AF_INET, rdata)
+    if rtype == RECORD_TYPES['AAAA']:
+        return socket.inet_ntop(socket.AF_INET6, rdata)
+    if rtype in (RECORD_TYPES['CNAME'], RECORD_TYPES['NS']):
+        return read_name(packet, offset)[0]
+    if rtype == RECORD_TYPES['MX']:
+        return '%s %s' % (struct.unpack('!H', rdata[:2])[0], read_name(packet, offset + 2)[0])
+    if rtype == RECORD_TYPES['TXT']:
+        # A TXT record is made of several character strings put end to end
+        strings = []
+        position = 0
+        while position < len(rdata):
+            strings.append(rdata[position + 1:position + 1 + rdata[position]].decode('utf-8', 'replace'))
+            position += 1 + rdata[position]
+        return ''.join(strings)
+    return rdata
+
+def parse_response(packet, query_id, rtype):
+    """Return (truncated, values) of the answers of rtype in a response packet"""
+    if len(packet) < 12:
+        raise DNSError('Short DNS response')
+    response_id, flags, qdcount, ancount = struct.unpack('!HHHH', packet[:8])
+    if response_id != query_id:
+        raise DNSError('DNS response does not match the query')
+    truncated = bool(flags & 0x0200)
+    rcode = flags & 0x000f
+    # NXDOMAIN only means the record is not there yet
+    if rcode not in (0, 3):
+        raise DNSError('DNS server answered with rcode %s' % rcode)
+    offset = 12
+    for _ in range(qdcount):
+        offset = read_name(packet, offset)[1] + 4
+    values = []
+    for _ in range(ancount):
+        offset = read_name(packet, offset)[1]
+        answer_type, answer_class, ttl, length = struct.unpack('!HHIH', packet[offset:offset + 10])
+        offset += 10
+        if answer_type == RECORD_TYPES[rtype]:
+            values.append(decode_rdata(packet, offset, length, answer_type))
+        offset += length
+    return truncated, values
+
+class UDPQuery(asyncio.DatagramProtocol):
+    """Send one query and hand the first answer to future"""
+
+    def __init__(self, packet, future):
+        self.packet = packet
+        self.future = future
+
+    def connection_made(self, transport):
+        transport.sendto(self.packet)
+
+    def datagram_received(self, data, addr):
+        if not self.future.done():
+            self.future.set_result(data)
+
+    def error_received(self, exc):
+        if not self.future.done():
+            self.future.set_exception(exc)
+
+async def query(server, name, rtype, port=DNS_PORT, timeout=3):
+    """Ask server for the rtype values of name, over UDP then over TCP if the answer is truncated"""
+    loop = asyncio.get_event_loop()
+    query_id = random.randint(0, 0xffff)
+    packet = build_query(name, rtype, query_id)
+    future = loop.create_future()
+    transport, protocol = await loop.create_datagram_endpoint(lambda: UDPQuery(packet, future), remote_addr=(server, port))
+    try:
+        truncated, values = parse_response(await asyncio.wait_for(future, timeout), query_id, rtype)
+    finally:
+        transport.close()
+    if not truncated:
+        return values
+    reader, writer = await asyncio.wait_for(asyncio.open_connection(server, port), timeout)
+    try:
+        writer.write(struct.pack('!H', len(packet)) + packet)
+        length = struct.unpack('!H', await asyncio.wait_for(reader.readexactly(2), timeout))[0]
+        return parse_response(await asyncio.wait_for(reader.readexactly(length), timeout), query_id, rtype)[1]
+    finally:
+        writer.close()
+
+def normalize_value(value, rtype):
+    if rtype == 'TXT':
+        return value.strip('"')
+    return value.rstrip('.').lower()
+
+async def wait_for_record(servers, name, rtype, value, port, timeout, query_timeout, interval):
+    """Ask all servers together until they all answer value for name"""
+    start = time.time()
+    deadline = start + timeout
+    expected = normalize_value(value, rtype)
+    delay = interval
+
+    async def ask(server):
+        try:
+            return [normalize_value(avalue, rtype) for avalue in await query(server, name, rtype, port, query_timeout)]
+        except (DNSError, OSError, EOFError, asyncio.TimeoutError) as error:
+            return str(error) or error.__class__.__name__
+    while True:
+        answers = await asyncio.gather(*[ask(aserver) for aserver in servers])
+        result = dict(name=name, type=rtype, value=value, answers=dict(zip(servers, answers)))
+        if all(isinstance(ananswer, list) and expected in ananswer for ananswer in answers):
+            result.update(converged=True, elapsed=round(time.time() - start, 2))
+            return result
+        if time.time() + delay > deadline:
+            result.update(converged=False, elapsed=None)
+            return result
+        await asyncio.sleep(delay)
+        delay = min(delay * 2, 10)
+
+def wait_for_propagation(servers, records, port=DNS_PORT, timeout=300, query_timeout=3, interval=1):
+    """Wait until all servers serve each (name, type, value) of records.
+    Returns a result by record with its convergence time (elapsed, None when it did not converge)"""
+    async def wait_all():
+        return await asyncio.gather(*[wait_for_record(servers, name, rtype, value, port, timeout, query_timeout, interval)
+                                      for name, rtype, value in records])
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(wait_all())
+    finally:
+        loop.close()
+
+def resolve_servers(names, port=DNS_PORT):
+    """Return the address of each name server given by name or address, IPv4 first"""
+    addresses = []
+    for aname in names:
+        try:
+            infos = socket.getaddrinfo(aname.rstrip('.'), port, socket.AF_INET, socket.SOCK_DGRAM)
+        except socket.gaierror:
+            infos = socket.getaddrinfo(aname.rstrip('.'), port, 0, socket.SOCK_DGRAM)
+        if infos[0][4][0] not in addresses:
+            addresses.append(infos[0][4][0])
+    return addresses
@@ -0,0 +1,188 @@
+#!/usr/bin/env python
+
+import asyncio
+import hashlib
+import json
+import time
+from urllib.parse import urlencode
+
+try:
+    import aiohttp
+    import yarl
+    HAS_AIOHTTP = True
+except ImportError:
+    HAS_AIOHTTP = False
+
+try:
+    from ovh.exceptions import APIError, HTTPError, InvalidResponse, ResourceNotFoundError, BadParametersError, \
+        ResourceConflictError, Forbidden, NotCredential
+except ImportError:
+    # Same names as python-ovh so that callers catch the same errors with both clients
+    class APIError(Exception):
+        pass
+
+    class HTTPError(APIError):
+        pass
+
+    class InvalidResponse(APIError):
+        pass
+
+    class ResourceNotFoundError(APIError):
+        pass
+
+    class BadParametersError(APIError):
+        pass
+
+    class ResourceConflictError(APIError):
+        pass
+
+    class Forbidden(APIError):
+        pass
+
+    class NotCredential(APIError):
+        pass
+
+from ansible.module_utils.ovh_utils import DEFAULT_WORKERS
+
+ENDPOINTS = {
+    'ovh-eu': 'https://eu.api.ovh.com/1.0',
+    'ovh-us': 'https://api.us.ovhcloud.com/1.0',
+    'ovh-ca': 'https://ca.api.ovh.com/1.0',
+    'kimsufi-eu': 'https://eu.api.kimsufi.com/1.0',
+    'kimsufi-ca': 'https://ca.api.kimsufi.com/1.0',
+    'soyoustart-eu': 'https://eu.api.soyoustart.com/1.0',
+    'soyoustart-ca': 'https://ca.api.soyoustart.com/1.0',
+}
+# Error raised for each HTTP status, like python-ovh
+STATUS_ERRORS = {400: BadParametersError, 401: NotCredential, 403: Forbidden, 404: ResourceNotFoundError, 409: ResourceConflictError}
+# Seconds allowed for a whole call and for opening a connection
+DEFAULT_TIMEOUT = 180
+CONNECT_TIMEOUT = 10
+
+
+def sign(application_secret, consumer_key, method, url, body, timestamp):
+    """Return the OVH signature of a call: $1$ + SHA1 of AS+CK+METHOD+URL+BODY+TSTAMP joined by +"""
+    signature = '+'.join([application_secret, consumer_key, method.upper(), url, body, str(timestamp)])
+    return '$1$' + hashlib.sha1(signature.encode('utf-8')).hexdigest()
+
+def canonicalize(params):
+    """Name and format parameters like python-ovh: leading _ is removed (e.g. _from), booleans are lowercase"""
+    result = {}
+    for key, value in params.items():
+        if isinstance(value, bool):
+            value = str(value).lower()
+        result[key[1:] if key.startswith('_') else key] = value
+    return result
+
+
+class AsyncClient(object):
+    """OVH API client for asyncio. Calls share a pool of connections limited to max_workers by host"""
+
+    def __init__(self, endpoint, application_key, application_secret, consumer_key,
+                 max_workers=DEFAULT_WORKERS, timeout=DEFAULT_TIMEOUT, time_delta=None):
+        self.endpoint = ENDPOINTS.get(endpoint, endpoint)
+        self.application_key = application_key
+        self.application_secret = application_secret
+        self.consumer_key = consumer_key
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self.time_delta = time_delta
+        self.session = None
+
+    async def __aenter__(self):
+        await self.open()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def open(self):
+        connector = aiohttp.TCPConnector(limit=self.max_workers, limit_per_host=self.max_workers)
+        self.session = aiohttp.ClientSession(connector=connector,
+                                             timeout=aiohttp.ClientTimeout(total=self.timeout, connect=CONNECT_TIMEOUT))
+        if self.time_delta is None:
+            # Signatures are checked against the API clock
+            try:
+                self.time_delta = await self.call('GET', '/auth/time', need_auth=False) - int(time.time())
+            except BaseException:
+                # __aexit__ is not called when __aenter__ fails: the session would leak
+                await self.close()
+                raise
+
+    async def close(self):
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+
+    async def call(self, method, path, params=None, data=None, need_auth=True):
+        url = self.endpoint + path
+        if params:
+            url += '?' + urlencode(sorted(canonicalize(params).items()))
+        body = json.dumps(canonicalize(data)) if data is not None else ''
+        headers = {'X-Ovh-Application': self.application_key}
+        if body:
+            headers['Content-Type'] = 'application/json'
+        if need_auth:
+            timestamp = int(time.time()) + self.time_delta
+            headers['X-Ovh-Consumer'] = self.consumer_key
+            headers['X-Ovh-Timestamp'] = str(timestamp)
+            headers['X-Ovh-Signature'] = sign(self.application_secret, self.consumer_key, method, url, body, timestamp)
+        try:
+            # The URL is sent as it was signed: aiohttp must not requote it (e.g. %3A or %2F of IPv6 ids and blocks)
+            async with self.session.request(method, yarl.URL(url, encoded=True), data=body or None, headers=headers) as response:
+                status = response.status
+                text = await response.text()
+        except (aiohttp.ClientError, asyncio.TimeoutError) as error:
+            raise HTTPError("Low HTTP request failed error", error)
+        try:
+            payload = json.loads(text) if text else None
+        except ValueError as error:
+            raise InvalidResponse("Failed to decode API response", error)
+        if 200 <= status < 300:
+            return payload
+        message = payload.get('message') if isinstance(payload, dict) else text
+        raise STATUS_ERRORS.get(status, APIError)(message)
+
+    async def get(self, path, **params):
+        return await self.call('GET', path, params=params)
+
+    async def post(self, path, **data):
+        return await self.call('POST', path, data=data)
+
+    async def put(self, path, **data):
+        return await self.call('PUT', path, data=data)
+
+    async def delete(self, path):
+        return await self.call('DELETE', path)
+
+
+def from_client(ovhclient, max_workers=DEFAULT_WORKERS, timeout=DEFAULT_TIMEOUT):
+    """Return an AsyncClient with the credentials of a python-ovh client (which already read ovh.conf),
+    None when they can not be read"""
+    try:
+        return AsyncClient(ovhclient._endpoint, ovhclient._application_key, ovhclient._application_secret,
+                           ovhclient._consumer_key, max_workers, timeout, getattr(ovhclient, '_time_delta', None))
+    except AttributeError:
+        return None
+
+def bulk_call(client, calls):
+    """Run calls ((method, path, params or data) tuples) together from synchronous code.
+    Results keep the order of calls, the first error is raised"""
+    async def run_all():
+        async with client:
+            # Every call ends before the session is closed, even when one fails
+            return await asyncio.gather(*[client.call(method, path, **({'params': parameters} if method in ['GET', 'DELETE'] else {'data': parameters}))
+                                          for method, path, parameters in calls], return_exceptions=True)
+    loop = asyncio.new_event_loop()
+    try:
+        results = loop.run_until_complete(run_all())
+    finally:
+        loop.close()
+    for aresult in results:
+        if isinstance(aresult, Exception):
+            raise aresult
+    return results
+
+def bulk_get(client, paths):
+    """GET all paths together from synchronous code"""
+    return bulk_call(client, [('GET', apath, None) for apath in paths])
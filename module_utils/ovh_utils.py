@@ -4,34 +4,261 @@ try:
     import ovh
     import ovh.exceptions
     from ovh.exceptions import APIError
+    from requests.adapters import HTTPAdapter
     HAS_OVH = True
 except ImportError:
     HAS_OVH = False
 
-from time import sleep
+import base64
+import binascii
+import fcntl
+import hashlib
+import json
+import os
+from fnmatch import fnmatchcase
+try:
+    from urllib.parse import quote
+except ImportError:
+    from urllib import quote
+from time import sleep, time
+try:
+    # Values of OVH API are unicode on python 2
+    STRING_TYPES = (str, unicode)
+except NameError:
+    STRING_TYPES = (str,)
+
+# Re-exported: the OVH modules import run_module with the other helpers
+from ansible.module_utils.profile_utils import run_module
+
+# Upper bound of simultaneous calls made to OVH API by the bulk helpers
+DEFAULT_WORKERS = 10
+# Number of objects asked per page with CachedObjectList pagination
+PAGINATION_SIZE = 1000
+# Journal of the zones waiting for a deferred refresh (see ovh_dns_flush)
+REFRESH_JOURNAL_ENV = 'OVH_REFRESH_JOURNAL'
+DEFAULT_REFRESH_JOURNAL = '~/.ansible/ovh_dns_refresh.json'
 
 
 def get_ovh_client(module):
     if module.params['endpoint'] and module.params['application_key'] and module.params['application_secret'] and module.params['consumer_key']:
-        return ovh.Client(
+        ovhclient = ovh.Client(
             endpoint=module.params['endpoint'],
             application_key= module.params['application_key'],
             application_secret=module.params['application_secret'],
             consumer_key=module.params['consumer_key']
         )        
     else:
-        return ovh.Client()        
+        ovhclient = ovh.Client()        
+    return configure_session_pool(ovhclient, module.params.get('workers') or DEFAULT_WORKERS)
 
-def get_cloud(ovhclient, module, cloud_name):
+def configure_session_pool(ovhclient, pool_size=DEFAULT_WORKERS):
+    """Let the client session keep a connection alive for every worker of the bulk helpers"""
+    session = getattr(ovhclient, '_session', None)
+    if session is not None:
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+    return ovhclient
+
+def run_parallel(func, items, max_workers=DEFAULT_WORKERS):
+    """Call func on each item through a bounded thread pool. Results keep the order of items"""
+    items = list(items)
+    if len(items) > 1:
+        # Imported on first use: most module runs never need a pool
+        try:
+            from concurrent.futures import ThreadPoolExecutor
+        except ImportError:
+            ThreadPoolExecutor = None
+    if len(items) <= 1 or ThreadPoolExecutor is None:
+        return [func(anitem) for anitem in items]
+    pool = ThreadPoolExecutor(max_workers=min(max_workers, len(items)))
     try:
-        for acloud_id in ovhclient.get('/cloud/project'):
-            cloud_desc = ovhclient.get('/cloud/project/%s' % acloud_id)
-            if cloud_name == cloud_desc['description']:
-                return cloud_desc
-        return None
+        return list(pool.map(func, items))
+    finally:
+        pool.shutdown()
+
+def get_paths(ovhclient, paths, max_workers=DEFAULT_WORKERS):
+    """GET all paths concurrently, results keep the order of paths. The asyncio client (one event loop,
+    pooled connections) is used when aiohttp is installed, else the calls are spread on a thread pool"""
+    paths = list(paths)
+    if len(paths) > 1:
+        try:
+            from ansible.module_utils.ovh_async import HAS_AIOHTTP, from_client, bulk_get
+        except (ImportError, SyntaxError):
+            # python < 3.5 can not load the asyncio client
+            HAS_AIOHTTP = False
+        client = from_client(ovhclient, max_workers) if HAS_AIOHTTP else None
+        if client is not None:
+            results = bulk_get(client, paths)
+            # Next bulk calls do not need to ask the API clock again
+            ovhclient._time_delta = client.time_delta
+            return results
+    return run_parallel(ovhclient.get, paths, max_workers)
+
+def get_objects(ovhclient, path, items, max_workers=DEFAULT_WORKERS):
+    """Return the details of each item of a listing. Items which are already objects (dict) are
+    kept as they are, the others are ids fetched concurrently on path % id"""
+    items = list(items)
+    ids = [anitem for anitem in items if not isinstance(anitem, dict)]
+    fetched = iter(get_paths(ovhclient, [path % anid for anid in ids], max_workers))
+    return [anitem if isinstance(anitem, dict) else next(fetched) for anitem in items]
+
+def iter_cached_object_pages(ovhclient, path, id_key=None):
+    """Yield the pages of objects of the collection path using OVH API CachedObjectList pagination.
+    Nothing is yielded when this mode can not be used"""
+    raw_call = getattr(ovhclient, 'raw_call', None)
+    if raw_call is None:
+        return
+    headers = {'X-Pagination-Mode': 'CachedObjectList-Pages', 'X-Pagination-Size': str(PAGINATION_SIZE)}
+    first_page = True
+    while True:
+        try:
+            response = raw_call('GET', path, headers=headers)
+        except APIError:
+            if first_page:
+                return
+            raise
+        except TypeError:
+            # raw_call of python-ovh < 1.0 has no headers argument: ids are listed instead
+            if first_page:
+                return
+            raise
+        if response.status_code != 200:
+            if first_page:
+                return
+            raise APIError("Failed to get a page of %s: HTTP %s" % (path, response.status_code))
+        page = response.json()
+        # Collections without this mode answer with the ids list
+        if first_page and not all(isinstance(anobject, dict) and (id_key is None or id_key in anobject) for anobject in page):
+            return
+        yield page
+        first_page = False
+        cursor = response.headers.get('X-Pagination-Cursor-Next')
+        if not cursor:
+            return
+        headers['X-Pagination-Cursor'] = cursor
+
+def iter_collection(ovhclient, path, id_key=None, max_workers=DEFAULT_WORKERS):
+    """Yield all objects of the collection path as they are fetched. CachedObjectList pagination is
+    used when the API supports it, otherwise ids are listed and objects are fetched concurrently
+    by chunks. When id_key is given, the object id is saved under this key"""
+    pages = iter_cached_object_pages(ovhclient, path, id_key)
+    first_page = next(pages, None)
+    if first_page is not None:
+        for anobject in first_page:
+            yield anobject
+        for apage in pages:
+            for anobject in apage:
+                yield anobject
+        return
+    ids = ovhclient.get(path)
+    for start in range(0, len(ids), PAGINATION_SIZE):
+        chunk = ids[start:start + PAGINATION_SIZE]
+        for anid, anobject in zip(chunk, get_paths(ovhclient, ['%s/%s' % (path, quote(str(anid), safe='')) for anid in chunk], max_workers)):
+            if id_key is not None:
+                anobject.setdefault(id_key, anid)
+            yield anobject
+
+def get_collection(ovhclient, path, id_key=None, max_workers=DEFAULT_WORKERS):
+    """Return all objects of the collection path (see iter_collection)"""
+    return list(iter_collection(ovhclient, path, id_key, max_workers))
+
+def match_filters(anobject, filters):
+    """Tell if an object matches all filters. A filter value can be a glob pattern or a list of accepted values"""
+    for key, expected in (filters or {}).items():
+        value = anobject.get(key)
+        if isinstance(expected, list):
+            if value not in expected:
+                return False
+        elif isinstance(expected, STRING_TYPES) and isinstance(value, STRING_TYPES):
+            if not fnmatchcase(value, expected):
+                return False
+        elif value != expected:
+            return False
+    return True
+
+def project_object(anobject, fields):
+    """Keep only the given fields of an object (all fields when fields is empty)"""
+    if not fields:
+        return anobject
+    return dict((afield, anobject.get(afield)) for afield in fields)
+
+def server_side_filters(filters, keys):
+    """Return the filters among keys that can be given as is to OVH API (no glob pattern, no list)"""
+    return dict((key, value) for key, value in (filters or {}).items()
+                if key in keys and isinstance(value, STRING_TYPES) and not any(achar in value for achar in '*?['))
+
+def wait_with_backoff(check, timeout, delay=2, max_delay=30):
+    """Call check until it returns True, sleeping longer between each call. Returns False on timeout"""
+    deadline = time() + timeout
+    while not check():
+        if time() + delay > deadline:
+            return False
+        sleep(delay)
+        delay = min(delay * 2, max_delay)
+    return True
+
+def get_zone_name_servers(ovhclient, module, domain):
+    """Return the authoritative name servers of a zone hosted by OVH"""
+    try:
+        return ovhclient.get('/domain/zone/%s' % domain)['nameServers']
+    except APIError as apiError:
+        module.fail_json(changed=False, msg="Failed to call OVH API on get zone: {0}".format(apiError))
+
+def get_refresh_journal(path=None):
+    """Return the path of the refresh journal: path, else OVH_REFRESH_JOURNAL, else the default one"""
+    return os.path.expanduser(path or os.environ.get(REFRESH_JOURNAL_ENV) or DEFAULT_REFRESH_JOURNAL)
+
+def edit_refresh_journal(journal, edit):
+    """Call edit on the dirty zones of the journal (zone -> number of deferred refreshes) under a lock.
+    The zones are saved when edit changed them, edit result is returned"""
+    if not os.path.isdir(os.path.dirname(journal)):
+        os.makedirs(os.path.dirname(journal), 0o700)
+    with open(journal + '.lock', 'w') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            with open(journal) as stream:
+                zones = json.load(stream)
+        except (IOError, ValueError):
+            zones = {}
+        before = dict(zones)
+        result = edit(zones)
+        if zones != before:
+            with open(journal, 'w') as stream:
+                json.dump(zones, stream, indent=2, sort_keys=True)
+    return result
+
+def read_dirty_zones(journal):
+    if not os.path.exists(journal):
+        return {}
+    return edit_refresh_journal(journal, dict)
+
+def mark_dirty_zones(journal, counts):
+    """Add zones (zone -> number of deferred refreshes) to the journal"""
+    def mark(zones):
+        for azone, acount in counts.items():
+            zones[azone] = zones.get(azone, 0) + acount
+    edit_refresh_journal(journal, mark)
+
+def pop_dirty_zones(journal, domains=None):
+    """Remove the dirty zones (only those of domains when given) from the journal and return them.
+    A zone marked again meanwhile stays in the journal for the next flush"""
+    def pop(zones):
+        return dict((azone, zones.pop(azone)) for azone in list(zones) if domains is None or azone in domains)
+    if not os.path.exists(journal):
+        return {}
+    return edit_refresh_journal(journal, pop)
+
+def get_cloud_index(ovhclient, module):
+    """Return all cloud projects indexed by description"""
+    try:
+        return dict((cloud_desc['description'], cloud_desc) for cloud_desc in get_collection(ovhclient, '/cloud/project', 'project_id'))
     except APIError as apiError:
         module.fail_json(changed=False, msg="Failed to call OVH API on get_cloud: {0}".format(apiError))   
 
+def get_cloud(ovhclient, module, cloud_name):
+    return get_cloud_index(ovhclient, module).get(cloud_name)
+
 def get_cloud_id(ovhclient, module, cloud_name):
     my_cloud = get_cloud(ovhclient, module, cloud_name)
     if my_cloud is None:
@@ -39,6 +266,48 @@ def get_cloud_id(ovhclient, module, cloud_name):
     else:
         return my_cloud['project_id']      
         
+def resolve_cloud_id(ovhclient, module):
+    """Return the cloud_id option when given (e.g. from ovh_cloud_catalog), else look cloud_name up"""
+    if module.params.get('cloud_id'):
+        return module.params['cloud_id']
+    if not module.params.get('cloud_name'):
+        module.fail_json(changed=False, msg="cloud_name or cloud_id is needed")
+    return get_cloud_id(ovhclient, module, module.params['cloud_name'])
+
+# Listings indexed by name, built once per process: (path, region) -> (objects by name, duplicated names)
+_NAME_INDEXES = {}
+
+def get_name_index(ovhclient, path, region=None):
+    """Return the listing of path indexed by name. The listing is filtered by region on OVH side"""
+    key = (path, region)
+    if key not in _NAME_INDEXES:
+        query = {'region': region} if region else {}
+        by_name = {}
+        duplicates = set()
+        for anobject in ovhclient.get(path, **query):
+            if anobject['name'] in by_name:
+                duplicates.add(anobject['name'])
+            by_name[anobject['name']] = anobject
+        _NAME_INDEXES[key] = (by_name, duplicates)
+    return _NAME_INDEXES[key]
+
+def forget_name_index(path):
+    """Drop the indexes of path, to be called once objects are created or deleted"""
+    for key in list(_NAME_INDEXES):
+        if key[0] == path:
+            del _NAME_INDEXES[key]
+
+def find_by_name(ovhclient, module, kind, path, name, region=None, name_list=None):
+    try:
+        by_name, duplicates = get_name_index(ovhclient, path, region)
+    except APIError as apiError:
+        module.fail_json(changed=False, msg="Failed to call OVH API on get_{0}: {1}".format(kind, apiError))
+    if name in duplicates:
+        module.fail_json(changed=False, msg="Several %ss are named %s, give a region to choose one" % (kind.replace('_', ' '), name))
+    if name_list is not None:
+        name_list.extend(sorted(by_name))
+    return by_name.get(name)
+
 def get_flavor_id(ovhclient, module, cloud_id, region, flavor_name):
     try:
         flavor_list = []
@@ -57,20 +326,49 @@ def get_image_id(ovhclient, module, cloud_id, region, image_name):
             if image_name == animage['name']:
                 return animage['id']
             image_list.append(animage['name'])
+        # Instance snapshots can be used as images too
+        snapshot = get_snapshot(ovhclient, module, cloud_id, image_name, region, image_list)
+        if snapshot is not None:
+            return snapshot['id']
         module.fail_json(changed=False, msg="Image specified does not exist. Images available : %s" % ', '.join(image_list))
     except APIError as apiError:
         module.fail_json(changed=False, msg="Failed to call OVH API on get_image_id: {0}".format(apiError))                
 
-def get_sshkey(ovhclient, module, cloud_id, key_name, sshkey_list = []):
+def get_snapshot(ovhclient, module, cloud_id, snapshot_name, region=None, snapshot_list=None):
+    try:
+        for asnapshot in ovhclient.get('/cloud/project/%s/snapshot' % cloud_id, region=region):
+            if snapshot_name == asnapshot['name']:
+                return asnapshot
+            if snapshot_list is not None:
+                snapshot_list.append(asnapshot['name'])
+        return None
+    except APIError as apiError:
+        module.fail_json(changed=False, msg="Failed to call OVH API on get_snapshot: {0}".format(apiError))
+
+def get_sshkey(ovhclient, module, cloud_id, key_name, sshkey_list=None):
+    """Return the key named key_name, None when it does not exist. Names of the other keys are
+    added to sshkey_list when given"""
     try:
         for sshkey in ovhclient.get('/cloud/project/%s/sshkey' % cloud_id):
             if key_name == sshkey['name']:
                 return sshkey
-            sshkey_list.append(sshkey['name'])
+            if sshkey_list is not None:
+                sshkey_list.append(sshkey['name'])
         return None
     except APIError as apiError:
         module.fail_json(changed=False, msg="Failed to call OVH API on get_sshkey: {0}".format(apiError))      
 
+def sshkey_fingerprint(public_key):
+    """Return the SHA256 fingerprint of a public key, whatever its comment and spacing"""
+    fields = (public_key or '').split()
+    if not fields:
+        return ''
+    try:
+        blob = base64.b64decode(fields[1 if len(fields) > 1 else 0].encode('ascii'))
+    except (binascii.Error, TypeError, ValueError, UnicodeEncodeError):
+        return ' '.join(fields)
+    return 'SHA256:' + base64.b64encode(hashlib.sha256(blob).digest()).decode('ascii').rstrip('=')
+
 def get_sshkey_id(ovhclient, module, cloud_id, key_name):
     sshkey_list = []
     ssh_key = get_sshkey(ovhclient, module, cloud_id, key_name, sshkey_list)
@@ -79,15 +377,17 @@ def get_sshkey_id(ovhclient, module, cloud_id, key_name):
     else:
         return ssh_key['id']
 
-def get_private_network(ovhclient, module, cloud_id, network_name, network_list = []):
-    try:        
-        for annetwork in ovhclient.get('/cloud/project/%s/network/private' % cloud_id):
-            if network_name == annetwork['name']:
-                return annetwork
-            network_list.append(annetwork['name'])
+def get_private_network(ovhclient, module, cloud_id, network_name, network_list=None):
+    # Private networks are global to the project
+    return find_by_name(ovhclient, module, 'private_network', '/cloud/project/%s/network/private' % cloud_id, network_name, None, network_list)
+
+def get_private_network_by_id(ovhclient, module, cloud_id, network_id):
+    try:
+        return ovhclient.get('/cloud/project/%s/network/private/%s' % (cloud_id, network_id))
+    except ovh.exceptions.ResourceNotFoundError:
         return None
     except APIError as apiError:
-        module.fail_json(changed=False, msg="Failed to call OVH API on get_private_network: {0}".format(apiError))            
+        module.fail_json(changed=False, msg="Failed to call OVH API on get_private_network: {0}".format(apiError))
 
 def get_private_network_id(ovhclient, module, cloud_id, network_name):
     network_list = []
@@ -98,15 +398,8 @@ def get_private_network_id(ovhclient, module, cloud_id, network_name):
         return network['network']
 
 
-def get_volume(ovhclient, module, cloud_id, volume_name, region=None, volume_list = []):
-    try:        
-        for avolume in ovhclient.get('/cloud/project/%s/volume' % cloud_id, region=region):
-            if volume_name == avolume['name']:
-                return avolume
-            volume_list.append(avolume['name'])
-        return None
-    except APIError as apiError:
-        module.fail_json(changed=False, msg="Failed to call OVH API on get_volume: {0}".format(apiError))            
+def get_volume(ovhclient, module, cloud_id, volume_name, region=None, volume_list=None):
+    return find_by_name(ovhclient, module, 'volume', '/cloud/project/%s/volume' % cloud_id, volume_name, region, volume_list)
 
 def get_volume_id(ovhclient, module, cloud_id, volume_name, region=None):
     volume_list = []
@@ -116,19 +409,12 @@ def get_volume_id(ovhclient, module, cloud_id, volume_name, region=None):
     else:
         return volume['id']
 
-def get_instance(ovhclient, module, cloud_id, instance_name, instance_list = []):
-    try:        
-        for aninstance in ovhclient.get('/cloud/project/%s/instance' % cloud_id):
-            if instance_name == aninstance['name']:
-                return aninstance
-            instance_list.append(aninstance['name'])
-        return None
-    except APIError as apiError:
-        module.fail_json(changed=False, msg="Failed to call OVH API on get_instance: {0}".format(apiError))            
+def get_instance(ovhclient, module, cloud_id, instance_name, region=None, instance_list=None):
+    return find_by_name(ovhclient, module, 'instance', '/cloud/project/%s/instance' % cloud_id, instance_name, region, instance_list)
 
-def get_instance_id(ovhclient, module, cloud_id, instance_name):
+def get_instance_id(ovhclient, module, cloud_id, instance_name, region=None):
     instance_list = []
-    instance = get_instance(ovhclient, module, cloud_id, instance_name, instance_list)
+    instance = get_instance(ovhclient, module, cloud_id, instance_name, region, instance_list)
     if instance is None:
         module.fail_json(changed=False, msg="Instance specified does not exist. Instances available : %s" % ', '.join(instance_list))
     else:
@@ -146,18 +432,19 @@ def get_interface(ovhclient, module, cloud_id, instance_id, network_id):
         module.fail_json(changed=False, msg="Failed to call OVH API on get_interface: {0}".format(apiError))            
 
 
-def get_vrack(ovhclient, module, vrack_name, vrack_list = []):
-    try:        
-        for avrack in ovhclient.get('/vrack'):
-            vrack_info = ovhclient.get('/vrack/%s' % avrack)
-            if vrack_name == vrack_info['name']:
-                vrack_info['id'] = avrack
-                return vrack_info
-            vrack_list.append(vrack_info['name'])
-        return None
+def get_vrack_index(ovhclient, module):
+    """Return all vracks indexed by name"""
+    try:
+        return dict((vrack_info['name'], vrack_info) for vrack_info in get_collection(ovhclient, '/vrack', 'id'))
     except APIError as apiError:
         module.fail_json(changed=False, msg="Failed to call OVH API on get_vrack: {0}".format(apiError))   
 
+def get_vrack(ovhclient, module, vrack_name, vrack_list=None):
+    vrack_index = get_vrack_index(ovhclient, module)
+    if vrack_list is not None:
+        vrack_list.extend(vrack_index.keys())
+    return vrack_index.get(vrack_name)
+
 def get_vrack_id(ovhclient, module, vrack_name):
     vrack_list = []
     vrack_info = get_vrack(ovhclient, module, vrack_name, vrack_list)
@@ -166,6 +453,27 @@ def get_vrack_id(ovhclient, module, vrack_name):
     else:
         return vrack_info['id']          
 
+def wait_vrack_tasks(ovhclient, module, vrack_id, task_ids, timeout=600):
+    """Wait until the given tasks are no more pending on the vrack"""
+    task_ids = set(task_ids)
+    def tasks_done():
+        try:
+            pending = task_ids.intersection(ovhclient.get('/vrack/%s/task' % vrack_id))
+        except APIError as apiError:
+            module.fail_json(changed=True, msg="Failed to call OVH API on vrack task: {0}".format(apiError))
+        for atask_id in pending:
+            try:
+                task = ovhclient.get('/vrack/%s/task/%s' % (vrack_id, atask_id))
+            except ovh.exceptions.ResourceNotFoundError:
+                continue
+            except APIError as apiError:
+                module.fail_json(changed=True, msg="Failed to call OVH API on vrack task: {0}".format(apiError))
+            if task['status'] == 'error':
+                module.fail_json(changed=True, msg="Vrack task %s (%s) failed" % (atask_id, task['function']))
+        return len(pending) == 0
+    if not wait_with_backoff(tasks_done, timeout):
+        module.fail_json(changed=True, msg="Timeout while waiting for vrack %s tasks" % vrack_id)
+
 def create_new_vrack(ovhclient, module, name, description=''):
     try:
         vrack_order = ovhclient.post('/order/vrack/new')
@@ -184,4 +492,3 @@ def create_new_vrack(ovhclient, module, name, description=''):
             return vrack_info
     except APIError as apiError:
         module.fail_json(changed=False, msg="Failed to call OVH API on create_new_vrack: {0}".format(apiError))   
-
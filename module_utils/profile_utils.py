@@ -0,0 +1,83 @@
+#!/usr/bin/env python
+
+# Profiling hook of the modules, kept apart from ovh_utils so that modules which
+# load the OVH client lazily (e.g. dns_propagation) can use it without loading it
+
+import os
+import re
+from time import time
+
+# Environment variables of the profiling hook of run_module
+PROFILE_DIR_ENV = 'OVH_PROFILE_DIR'
+PROFILE_NAME_ENV = 'OVH_PROFILE_NAME'
+PROFILE_MEMORY_ENV = 'OVH_PROFILE_MEMORY'
+# Number of functions and allocation sites given in the profile summary
+PROFILE_TOP = 10
+
+
+def run_module(main):
+    """Run the main of a module. When OVH_PROFILE_DIR is set, main is run under cProfile (and tracemalloc
+    when OVH_PROFILE_MEMORY is set): the profile is written in that directory and summed up in the result"""
+    directory = os.environ.get(PROFILE_DIR_ENV)
+    if not directory:
+        return main()
+    import cProfile
+    import pstats
+    import socket
+    from ansible.module_utils.basic import AnsibleModule
+    module_name = re.search(r'module:\s*(\S+)', main.__globals__.get('DOCUMENTATION', '') or '')
+    name = os.environ.get(PROFILE_NAME_ENV) or '%s-%s-%d' % (module_name.group(1) if module_name else 'module', socket.gethostname(), time())
+    path = os.path.join(os.path.expanduser(directory), re.sub(r'[^\w.-]+', '_', name))
+    memory = os.environ.get(PROFILE_MEMORY_ENV, '').lower() not in ['', '0', 'false', 'no']
+    if memory:
+        import tracemalloc
+    profiler = cProfile.Profile()
+    start = time()
+
+    def write_profile(result):
+        """Stop profiling, write the files and add the summary to the module result (once)"""
+        profiler.disable()
+        summary = dict(file=path + '.prof', elapsed=round(time() - start, 3))
+        if memory:
+            # Snapshot first: writing the profile must not count in the allocations
+            statistics = tracemalloc.take_snapshot().statistics('lineno')
+            summary['memory_peak'] = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+        try:
+            if not os.path.isdir(os.path.dirname(path)):
+                os.makedirs(os.path.dirname(path))
+            profiler.dump_stats(path + '.prof')
+            with open(path + '.txt', 'w') as stream:
+                stats = pstats.Stats(profiler, stream=stream)
+                stats.sort_stats('cumulative').print_stats(50)
+            summary['calls'] = stats.total_calls
+            summary['top'] = ['%s:%s(%s) %.3fs' % (afile, aline, afunction, stats.stats[(afile, aline, afunction)][3])
+                              for afile, aline, afunction in stats.fcn_list[:PROFILE_TOP]]
+            if memory:
+                with open(path + '.memory.txt', 'w') as stream:
+                    stream.write('\n'.join(str(astat) for astat in statistics[:100]) + '\n')
+                summary['memory_top'] = [str(astat) for astat in statistics[:PROFILE_TOP]]
+        except (IOError, OSError) as error:
+            summary['msg'] = 'Failed to write profile: %s' % error
+        result.setdefault('profile', summary)
+
+    def profiled(original):
+        def exit_method(self, **result):
+            if profiler_state['running']:
+                profiler_state['running'] = False
+                write_profile(result)
+            original(self, **result)
+        return exit_method
+    profiler_state = dict(running=True)
+    AnsibleModule.exit_json = profiled(AnsibleModule.exit_json)
+    AnsibleModule.fail_json = profiled(AnsibleModule.fail_json)
+    if memory:
+        tracemalloc.start()
+    profiler.enable()
+    try:
+        return main()
+    finally:
+        # main ended without exit_json/fail_json (e.g. an exception): the profile is still written
+        if profiler_state['running']:
+            profiler_state['running'] = False
+            write_profile({})
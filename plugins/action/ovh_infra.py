@@ -23,11 +23,15 @@ class ActionModule(ActionBase):
 		template = self._task.args.get('template', None)
 		hostname = self._task.args.get('hostname', None)
 		service = self._task.args.get('service', None)
+		targets = self._task.args.get('targets', None)
+		reverses = self._task.args.get('reverses', None)
+		block = self._task.args.get('block', None)
 		
 		result['failed'] = True
 		new_src = name
 		
-		if name is None: 
+		# targets, reverses and block work on many objects without a name
+		if name is None and not (targets or reverses or block): 
 			result['msg'] = "name is required"
 		elif service is None:
 			result['msg'] = "service is required"
@@ -49,11 +53,12 @@ class ActionModule(ActionBase):
 		module_executed = False
 
 		new_module_args = self._task.args.copy()
-		new_module_args.update(
-			dict(
-				name=new_src
+		if name is not None:
+			new_module_args.update(
+				dict(
+					name=new_src
+				)
 			)
-		)
 		module_return = self._execute_module(module_name='ovh_infra', module_args=new_module_args, task_vars=task_vars)
 		module_executed = True
 
@@ -0,0 +1,124 @@
+#!/usr/bin/env python
+
+# Cold start benchmark of the modules: each module of library/ is imported in a
+# fresh interpreter (like a task does) against stub ansible and ovh packages, so
+# that only the imports of this repository are measured.
+#
+#   python -m pytest tests/test_startup.py    # checks the budgets
+#   python tests/test_startup.py [repo]       # prints the startup time of each module
+
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Runs of each module, the fastest one is kept
+RUNS = 3
+# Seconds allowed to import a module (the interpreter start is not counted)
+IMPORT_BUDGET = 0.5
+# Dependencies only some paths need: no module may load them on import (asyncio and
+# cryptography load ast and concurrent.futures themselves, so those can not be checked)
+LAZY_MODULES = ['yaml', 'aiohttp', 'cProfile', 'tracemalloc', 'ansible.module_utils.ovh_async']
+
+STUBS = {
+    'ansible/__init__.py': '',
+    'ansible/module_utils/__init__.py': '__path__.append(%r)\n',
+    'ansible/module_utils/basic.py': '''
+BOOLEANS_TRUE = ['y', 'yes', 'on', '1', 'true', 1, True]
+BOOLEANS_FALSE = ['n', 'no', 'off', '0', 'false', 0, False]
+BOOLEANS = BOOLEANS_TRUE + BOOLEANS_FALSE
+
+class AnsibleModule(object):
+    def __init__(self, *args, **kwargs):
+        raise NotImplementedError('stub')
+''',
+    'ovh/__init__.py': 'from ovh import exceptions\n\nclass Client(object):\n    pass\n',
+    'ovh/exceptions.py': '''
+class APIError(Exception):
+    pass
+
+class HTTPError(APIError):
+    pass
+
+class InvalidResponse(APIError):
+    pass
+
+class ResourceNotFoundError(APIError):
+    pass
+
+class BadParametersError(APIError):
+    pass
+
+class ResourceConflictError(APIError):
+    pass
+
+class Forbidden(APIError):
+    pass
+
+class NotCredential(APIError):
+    pass
+''',
+    'requests/__init__.py': '',
+    'requests/adapters.py': 'class HTTPAdapter(object):\n    pass\n',
+}
+
+MEASURE = '''
+import json, runpy, sys, time
+before = set(sys.modules)
+start = time.time()
+runpy.run_path(sys.argv[1], run_name='startup_benchmark')
+elapsed = time.time() - start
+print(json.dumps(dict(elapsed=elapsed, modules=sorted(set(sys.modules) - before))))
+'''
+
+
+def write_stubs(directory, root):
+    for path, content in STUBS.items():
+        path = os.path.join(directory, path)
+        if not os.path.isdir(os.path.dirname(path)):
+            os.makedirs(os.path.dirname(path))
+        with open(path, 'w') as stream:
+            stream.write(content % os.path.join(root, 'module_utils') if '%r' in content else content)
+
+def measure(module_path, stubs):
+    """Return the fastest import time of module_path and the modules it loaded"""
+    env = dict(os.environ, PYTHONPATH=stubs, PYTHONDONTWRITEBYTECODE='1')
+    env.pop('OVH_PROFILE_DIR', None)
+    results = []
+    for _ in range(RUNS):
+        output = subprocess.check_output([sys.executable, '-c', MEASURE, module_path], env=env, cwd=stubs)
+        results.append(json.loads(output.decode('utf-8').strip().splitlines()[-1]))
+    return min(results, key=lambda aresult: aresult['elapsed'])
+
+def library_modules(root):
+    library = os.path.join(root, 'library')
+    return sorted(os.path.join(library, aname) for aname in os.listdir(library) if aname.endswith('.py'))
+
+@pytest.fixture(scope='module')
+def stubs():
+    directory = tempfile.mkdtemp()
+    write_stubs(directory, ROOT)
+    return directory
+
+@pytest.mark.parametrize('module_path', library_modules(ROOT), ids=os.path.basename)
+def test_module_startup(module_path, stubs):
+    result = measure(module_path, stubs)
+    assert result['elapsed'] < IMPORT_BUDGET, "%s takes %.3fs to import" % (os.path.basename(module_path), result['elapsed'])
+    eager = [aname for aname in LAZY_MODULES if aname in result['modules']]
+    assert not eager, "%s imports %s on startup" % (os.path.basename(module_path), ', '.join(eager))
+
+
+if __name__ == '__main__':
+    root = os.path.abspath(sys.argv[1]) if len(sys.argv) > 1 else ROOT
+    directory = tempfile.mkdtemp()
+    write_stubs(directory, root)
+    total = 0
+    for module_path in library_modules(root):
+        result = measure(module_path, directory)
+        total += result['elapsed']
+        print('%-24s %7.1f ms %4d modules' % (os.path.basename(module_path)[:-3], result['elapsed'] * 1000, len(result['modules'])))
+    print('%-24s %7.1f ms' % ('total', total * 1000))